@@ -1,22 +1,61 @@
-from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi import FastAPI, HTTPException, Depends, Query, Header, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import asyncpg
+import base64
+import json
 import re
-from typing import List, Optional, Annotated
+from typing import AsyncIterator, List, Optional, Annotated, Tuple
 import os
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-from .database import connect_to_db, disconnect_from_db
-from .models import SimpleTrack, SimpleLyrics
+from .database import PoolTimeout, LazyConnection, acquire, create_pool, close_pool, pool_stats, pools, target_stats
+from .models import SimpleTrack, CacheInvalidation, BatchLookup
+from .normalize import prepare_input
+from .cache import track_cache, synced_cache, id_key, signature_key, etag_key, NOT_FOUND
+from .lrc import parse_lrc
+from .metrics import MetricsMiddleware, log_sampled, logger, render as render_metrics, timed_stage
+from .queries import prepared_statement, register_query, warmup
+from .compression import CompressionMiddleware, strip_encoding
+from .serialization import (FastJSONResponse, SNIPPET_START, SNIPPET_STOP, dumps, export_row_to_track, lean_track,
+                            lyrics_row_to_hit, search_row_to_track)
+from .suggest import SUGGEST_ENABLED, suggester
+from .singleflight import SingleFlight
+from .readiness import readiness
+import asyncio
+from datetime import datetime, timezone
 from psycopg2.extras import RealDictCursor
 
 # load the .env file
 load_dotenv()
 
+# open the connection pools on startup and close them on shutdown. the
+# hot queries are run once on every idle connection before serving, and
+# the /suggest index is built and kept fresh in the background. /ready
+# reports the worker ready once this warmup is done
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await create_pool()
+    for db_pool in pools():
+        await warmup(db_pool)
+    suggest_task = asyncio.create_task(suggester.run(acquire, prepare_input)) if SUGGEST_ENABLED else None
+    readiness.warmed = True
+    try:
+        yield
+    finally:
+        # already set by app.server's stop signal handler, this covers
+        # plain uvicorn where the listener is closed by now
+        readiness.draining = True
+        if suggest_task is not None:
+            suggest_task.cancel()
+        # waits for connections still in use to be released
+        await close_pool()
+
 # create app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
-# load database url 
-DATABASE_URL = os.getenv("DATABASE_URL")
+# token for the /admin endpoints, they are disabled when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 
 # to deploy 
 origins = [
@@ -33,28 +72,39 @@ app.add_middleware(
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"]
 )
 
-# Dependency 
+# compress responses above this many bytes
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESS_MIN_SIZE", "1024")))
+
+# latency, payload and error metrics per route, served at /metrics
+app.add_middleware(MetricsMiddleware)
+
+# page sizes for /tracks
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", "100"))
+
+# no pooled connection freed up in time
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request, exc):
+    return JSONResponse(status_code=503, content={"detail": "Database busy, try again"})
+
+# Dependency, borrows a connection from the pool on first use
 async def get_db():
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = LazyConnection()
     try:
         yield conn
     finally:
-        await conn.close()
-
-# preprocessing the string by striping
-# whitespace and converting to lowercase
-def prepare_input(input: str) -> str: 
-    input = input.lower()
-    input = re.sub(r"[`~!@#$%^&*()_|+\-=?;:,.<>{}\[\]\\\/]", " ", input)
-    input = re.sub(r"['’]", "", input)
-    
-    # Collapse multiple spaces into a single space
-    input = ' '.join(input.split())
+        await conn.release()
 
-    return input
+# Dependency for the /admin endpoints
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
 
 # preprocessing the optional strings 
 def prepare_optional_string(s: Optional[str]) -> Optional[str]:
@@ -65,13 +115,84 @@ def prepare_optional_string(s: Optional[str]) -> Optional[str]:
         return None
     return processed_val
 
+# splits prepared input into the whole words (for plainto_tsquery, which
+# reads "or" and a leading "-" as plain words, unlike websearch_to_tsquery)
+# and a prefix term for the last word, so "taylor sw" matches "taylor swift".
+# the last word is quoted as a single lexeme, so nothing in it is read as
+# a to_tsquery operator
+def build_fts_terms(input: str) -> Tuple[str, str]:
+    words = input.split()
+    if not words:
+        return "", ""
+    lexeme = words[-1].replace("\\", "\\\\").replace("'", "''")
+    return ' '.join(words[:-1]), f"'{lexeme}':*"
+
+# the opaque /tracks cursor is the (rank, id) of the last row on a page
+def encode_cursor(rank: float, id: int) -> str:
+    raw = json.dumps([rank, id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        rank, id = json.loads(raw)
+        return float(rank), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+
+SEARCH_QUERY_TEMPLATE = """
+    SELECT
+      tracks.id,
+      tracks.name,
+      tracks.artist_name,
+      tracks.album_name,
+      tracks.duration,
+      lyrics.instrumental,{lyric_columns}
+      coalesce(octet_length(lyrics.plain_lyrics), 0) > 0 AS has_plain,
+      coalesce(octet_length(lyrics.synced_lyrics), 0) > 0 AS has_synced,
+      ranked.rank
+    FROM
+      tracks
+      CROSS JOIN (
+        SELECT plainto_tsquery('english', $1) && to_tsquery('english', $2) AS query
+      ) search
+      CROSS JOIN LATERAL (
+        SELECT ts_rank_cd(tracks.search_vector, search.query) AS rank
+      ) ranked
+      LEFT JOIN lyrics ON tracks.last_lyrics_id = lyrics.id
+    WHERE
+      tracks.search_vector @@ search.query
+      AND (
+        $3::real IS NULL
+        OR ranked.rank < $3::real
+        OR (ranked.rank = $3::real AND tracks.id > $4::bigint)
+      )
+    ORDER BY
+      ranked.rank DESC,
+      tracks.id
+    LIMIT $5
+    """
+
+SEARCH_WARMUP_ARGS = ("", "'warmup':*", None, None, 1)
+
+# lyric text is only read when asked for. octet_length doesn't
+# detoast, so the has_ flags stay cheap for long lyrics
+SEARCH_QUERY = register_query("search_tracks", SEARCH_QUERY_TEMPLATE.format(lyric_columns="""
+      lyrics.plain_lyrics,
+      lyrics.synced_lyrics,"""), SEARCH_WARMUP_ARGS)
+SEARCH_QUERY_NO_LYRICS = register_query("search_tracks_no_lyrics", SEARCH_QUERY_TEMPLATE.format(lyric_columns=""),
+                                        SEARCH_WARMUP_ARGS)
+
 async def get_tracks_by_keyword(
     q: Optional[str],
     track_name: Optional[str],
     artist_name: Optional[str],
     album_name: Optional[str],
-    conn: asyncpg.Connection
-) -> List[SimpleTrack]:
+    conn: asyncpg.Connection,
+    include_lyrics: bool = True,
+    limit: int = SEARCH_DEFAULT_LIMIT,
+    cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
 
     # preprocessing input...
     q = prepare_input(q) if q else None
@@ -80,64 +201,151 @@ async def get_tracks_by_keyword(
     album_name = prepare_input(album_name) if album_name else None
 
     if not q and not track_name:
-        return []
+        return [], None
 
-    # Using PostgreSQL full-text search syntax with to_tsvector and to_tsquery
+    after_rank, after_id = decode_cursor(cursor) if cursor else (None, None)
+
+    # Using PostgreSQL full-text search on the stored search_vector column
     if q:
-        fts_query = ' & '.join(q.split())
+        words, prefix = build_fts_terms(q)
     else:
-        fts_query = ' & '.join(filter(None, [track_name, artist_name, album_name]))
+        words, prefix = build_fts_terms(' '.join(filter(None, [track_name, artist_name, album_name])))
 
-    
-    query = """
-    SELECT
-      tracks.id,
-      tracks.name,
-      tracks.artist_name,
-      tracks.album_name,
-      tracks.duration,
-      lyrics.instrumental,
-      lyrics.plain_lyrics,
-      lyrics.synced_lyrics
-    FROM
-      tracks
-      LEFT JOIN lyrics ON tracks.last_lyrics_id = lyrics.id
-    WHERE
-      to_tsvector('english', coalesce(tracks.name_lower, '') || ' ' || coalesce(tracks.artist_name_lower, '') || ' ' || coalesce(tracks.album_name_lower, '')) @@ to_tsquery($1)
-    LIMIT 20
-    """
-    print(f"FTS query: {fts_query}")
+    query = SEARCH_QUERY if include_lyrics else SEARCH_QUERY_NO_LYRICS
+    log_sampled("fts_query words=%r prefix=%r limit=%d", words, prefix, limit)
 
     try: 
-        rows = await conn.fetch(query, fts_query)
+        # one extra row tells us whether there is a next page. identical
+        # searches in flight share the query and its rows
+        params = (words, prefix, after_rank, after_id, limit + 1)
+        rows = await searches.do((query,) + params, lambda: conn.fetch(query, *params))
 
         if not rows:
-            return []
+            return [], None
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['rank'], rows[-1]['id'])
          
-        #print("Fetched rows:")
-        #for row in rows:
-        #    print(row)
-        
-        tracks = []
-        for row in rows:
-            last_lyrics = SimpleLyrics(
-                plain_lyrics=row['plain_lyrics'] or "",  # empty string is instrumental is TRUE
-                synced_lyrics=row['synced_lyrics'] or "",  # empty string is instrumental is TRUE
-                instrumental=row['instrumental'] if row['instrumental'] is not None else False
-            )
-            track = SimpleTrack(
-                id=row['id'],
-                name=row['name'],
-                artist_name=row['artist_name'],
-                album_name=row['album_name'],
-                duration=row['duration'],
-                last_lyrics=last_lyrics
-            )
-            tracks.append(track)
-
-        return tracks
-    except Exception as e:
-        print(f"Error executing query: {e}")
+        # plain dicts in the SimpleTrack shape, no per-row models
+        with timed_stage("build_models"):
+            tracks = [search_row_to_track(row, include_lyrics) for row in rows]
+
+        return tracks, next_cursor
+    except PoolTimeout:
+        raise
+    except Exception:
+        logger.exception("search_tracks query failed")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+# ts_headline options for the /tracks/by-lyrics snippets (optional in .env).
+# the match markers are always appended (later options win), lyrics_row_to_hit
+# turns them into <b></b> once the text is escaped
+LYRICS_SNIPPET_OPTIONS = os.getenv("LYRICS_SNIPPET_OPTIONS", "MaxFragments=2, MinWords=5, MaxWords=12")
+LYRICS_HEADLINE_OPTIONS = f'{LYRICS_SNIPPET_OPTIONS}, StartSel="{SNIPPET_START}", StopSel="{SNIPPET_STOP}"'
+
+# matches and ranks on the stored lyrics.search_vector only. the page
+# (plus one row to detect a next page) is picked first, and ts_headline
+# reads the lyric text only for the rows that are returned. ranks are
+# normalized by document length so long lyrics don't win on repetition
+LYRICS_SEARCH_QUERY_TEMPLATE = """
+    SELECT
+      page.id,
+      page.name,
+      page.artist_name,
+      page.album_name,
+      page.duration,
+      page.instrumental,
+      page.has_plain,
+      page.has_synced,
+      page.rank,
+      CASE WHEN row_number() OVER (ORDER BY page.rank DESC, page.id) <= $4
+        THEN ts_headline('english', lyrics.plain_lyrics, page.query, $5)
+      END AS snippet
+    FROM (
+      SELECT
+        tracks.id,
+        tracks.name,
+        tracks.artist_name,
+        tracks.album_name,
+        tracks.duration,
+        lyrics.id AS lyrics_id,
+        lyrics.instrumental,
+        coalesce(octet_length(lyrics.plain_lyrics), 0) > 0 AS has_plain,
+        coalesce(octet_length(lyrics.synced_lyrics), 0) > 0 AS has_synced,
+        search.query,
+        ranked.rank
+      FROM
+        lyrics
+        CROSS JOIN (
+          SELECT {tsquery}('english', $1) AS query
+        ) search
+        CROSS JOIN LATERAL (
+          SELECT ts_rank_cd(lyrics.search_vector, search.query, 1) AS rank
+        ) ranked
+        JOIN tracks ON tracks.last_lyrics_id = lyrics.id
+      WHERE
+        lyrics.search_vector @@ search.query
+        AND (
+          $2::real IS NULL
+          OR ranked.rank < $2::real
+          OR (ranked.rank = $2::real AND tracks.id > $3::bigint)
+        )
+      ORDER BY
+        ranked.rank DESC,
+        tracks.id
+      LIMIT $4 + 1
+    ) page
+      JOIN lyrics ON lyrics.id = page.lyrics_id
+    ORDER BY
+      page.rank DESC,
+      page.id
+    """
+
+LYRICS_SEARCH_WARMUP_ARGS = ("warmup", None, None, 1, LYRICS_HEADLINE_OPTIONS)
+
+# every word anywhere in the lyrics, or the words in order (<->)
+LYRICS_SEARCH_QUERY = register_query("search_lyrics", LYRICS_SEARCH_QUERY_TEMPLATE.format(tsquery="plainto_tsquery"),
+                                     LYRICS_SEARCH_WARMUP_ARGS)
+LYRICS_PHRASE_QUERY = register_query("search_lyrics_phrase", LYRICS_SEARCH_QUERY_TEMPLATE.format(tsquery="phraseto_tsquery"),
+                                     LYRICS_SEARCH_WARMUP_ARGS)
+
+async def get_tracks_by_lyrics(
+    q: str,
+    conn: asyncpg.Connection,
+    phrase: bool = False,
+    limit: int = SEARCH_DEFAULT_LIMIT,
+    cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+
+    q = prepare_input(q)
+    if not q:
+        return [], None
+
+    after_rank, after_id = decode_cursor(cursor) if cursor else (None, None)
+
+    query = LYRICS_PHRASE_QUERY if phrase else LYRICS_SEARCH_QUERY
+    log_sampled("lyrics_query q=%r phrase=%s limit=%d", q, phrase, limit)
+
+    try:
+        # the query returns one row past the page, without a snippet
+        params = (q, after_rank, after_id, limit, LYRICS_HEADLINE_OPTIONS)
+        rows = await searches.do((query,) + params, lambda: conn.fetch(query, *params))
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['rank'], rows[-1]['id'])
+
+        with timed_stage("build_models"):
+            hits = [lyrics_row_to_hit(row) for row in rows]
+
+        return hits, next_cursor
+    except PoolTimeout:
+        raise
+    except Exception:
+        logger.exception("search_lyrics query failed")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
@@ -147,46 +355,210 @@ async def get_tracks_by_keyword(
 async def read_root() -> dict:
     return {"message": "Welcome to LyricDB."}
 
+HEALTH_QUERY = register_query("health", "SELECT 1", ())
+
 # to check db connection 
 @app.get("/health", response_model = dict)
 async def health_check (db: asyncpg.Connection = Depends(get_db)):
     try:
-        query = "SELECT 1"
-        result = await db.fetchval(query)
-        return {"status": "ok", "result": result}
+        result = await db.fetchval(HEALTH_QUERY)
+        return {"status": "ok", "result": result, "pool": pool_stats(),
+                "targets": target_stats(), "suggest": suggester.stats()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# whether this worker should get traffic, without a database round trip.
+# 503 while it warms up or drains
+@app.get("/ready", response_model=dict)
+async def ready_check():
+    return JSONResponse(readiness.stats(), status_code=200 if readiness.ready else 503)
+
+# signature that matches no track, used to warm up the lookups
+SIGNATURE_WARMUP_ARGS = ("", "", "", 0)
+
+# id-only lookups used to answer If-None-Match without reading lyrics
+VERSION_BY_ID_QUERY = register_query("version_by_id", """
+SELECT t.id, t.last_lyrics_id
+FROM tracks t
+WHERE t.id = $1 AND t.last_lyrics_id IS NOT NULL
+""", (-1,))
+
+VERSION_BY_SIGNATURE_QUERY = register_query("version_by_signature", """
+SELECT t.id, t.last_lyrics_id
+FROM tracks t
+WHERE 
+    artist_name_lower = $1 AND 
+    name_lower = $2 AND 
+    album_name_lower = $3 AND 
+    duration BETWEEN $4-2 AND $4+2 AND 
+    t.last_lyrics_id IS NOT NULL
+ORDER BY
+    t.id
+LIMIT 1
+""", SIGNATURE_WARMUP_ARGS)
+
+# strong etag for a (track id, last lyrics id) version
+def track_etag(version: Tuple[int, int]) -> str:
+    return f'"{version[0]}-{version[1]}"'
+
+# If-None-Match uses weak comparison, so W/ and the encoding
+# suffix added by the compression middleware are ignored
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    tags = [strip_encoding(tag.strip().removeprefix("W/")) for tag in if_none_match.split(",")]
+    return etag in tags
+
+def set_etag(response: Response, version: Optional[Tuple[int, int]]):
+    if version is not None and version is not NOT_FOUND:
+        response.headers["ETag"] = track_etag(version)
+
+def not_modified(version: Tuple[int, int]) -> Response:
+    return Response(status_code=304, headers={"ETag": track_etag(version)})
+
+# identical lookups in flight at the same time share one query, keyed
+# like the cache. a new release gets hundreds of requests for the same
+# signature within a second, all of them cache misses
+lookups = SingleFlight("lookup")
+searches = SingleFlight("search")
+
+# current version of a lookup, from the cache or the cheap id-only query.
+# misses are cached too, and a cached 404 for the lookup itself answers
+# without a query
+async def lookup_version(key: tuple, db: asyncpg.Connection, query: str, *args) -> Optional[Tuple[int, int]]:
+    if track_cache.get(key) is NOT_FOUND:
+        return None
+    version = track_cache.get(etag_key(key))
+    if version is None:
+        version = await lookups.do(etag_key(key), lambda: read_version(key, db, query, *args))
+    return version if version is not NOT_FOUND else None
+
+async def read_version(key: tuple, db: asyncpg.Connection, query: str, *args) -> Optional[Tuple[int, int]]:
+    row = await db.fetchrow(query, *args)
+    if not row:
+        track_cache.set(etag_key(key), NOT_FOUND)
+        return NOT_FOUND
+    version = (row['id'], row['last_lyrics_id'])
+    track_cache.set(etag_key(key), version)
+    return version
+
+# reads and caches the track for a lookup, once for all concurrent
+# requests with the same key. returns the track (NOT_FOUND when there is
+# no row) and its version
+async def load_track(key: tuple, db: asyncpg.Connection, query: str, *args) -> Tuple[object, Optional[Tuple[int, int]]]:
+    async def load():
+        row = await db.fetchrow(query, *args)
+        if not row:
+            track_cache.set(key, NOT_FOUND)
+            return NOT_FOUND, None
+        return cache_track(key, dict(row))
+    return await lookups.do(key, load)
+
+# a looked up track, serialized straight from the cached dict. a returned
+# Response replaces the injected one, so its etag is carried over
+def track_response(track: dict, response: Response) -> FastJSONResponse:
+    etag = response.headers.get("ETag")
+    return FastJSONResponse(track, headers={"ETag": etag} if etag else None)
+
+# caches a freshly read track and its version, returns both
+def cache_track(key: tuple, track: dict) -> Tuple[dict, Optional[Tuple[int, int]]]:
+    last_lyrics_id = track.pop('last_lyrics_id', None)
+    track_cache.set(key, track)
+    version = None
+    if last_lyrics_id is not None:
+        version = (track['id'], last_lyrics_id)
+        track_cache.set(etag_key(key), version)
+    return track, version
+
+TRACK_BY_ID_QUERY = register_query("track_by_id", """
+SELECT 
+    t.id, 
+    t.name, 
+    t.artist_name, 
+    t.album_name, 
+    t.duration, 
+    l.instrumental,
+    l.plain_lyrics, 
+    l.synced_lyrics,
+    t.last_lyrics_id
+FROM tracks t
+JOIN lyrics l on t.last_lyrics_id= l.id
+WHERE t.id = $1
+""", (-1,))
+
 # uses id to get track info 
 @app.get('/get/{id}', response_model = dict)
-async def get_info(id: int, db: asyncpg.Connection = Depends(get_db)):
-    query = """
-    SELECT 
-        t.id, 
-        t.name, 
-        t.artist_name, 
-        t.album_name, 
-        t.duration, 
-        l.instrumental,
-        l.plain_lyrics, 
-        l.synced_lyrics
-    FROM tracks t
-    JOIN lyrics l on t.last_lyrics_id= l.id
-    WHERE t.id = $1
-    """
-    row = await db.fetchrow(query, id)
-    if not row: 
+async def get_info(
+    id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    key = id_key(id)
+    if if_none_match:
+        version = await lookup_version(key, db, VERSION_BY_ID_QUERY, id)
+        if version and etag_matches(if_none_match, track_etag(version)):
+            return not_modified(version)
+
+    cached = track_cache.get(key)
+    if cached is NOT_FOUND:
         raise HTTPException(status_code=404, detail="Track not found")
-    return dict(row)
+    if cached is not None:
+        set_etag(response, track_cache.get(etag_key(key)))
+        return track_response(cached, response)
 
-@app.get("/get/{artist_name}/{track_name}/{album_name}/{duration}",response_model = dict)
-async def read_track(artist_name: str, track_name: str, album_name: str, duration: int, db: asyncpg.Connection = Depends(get_db)):
-    # to lowercase 
-    artist_name = artist_name.lower()
-    track_name = track_name.lower()
-    album_name = album_name.lower()
+    track, version = await load_track(key, db, TRACK_BY_ID_QUERY, id)
+    if track is NOT_FOUND:
+        raise HTTPException(status_code=404, detail="Track not found")
+    set_etag(response, version)
+    return track_response(track, response)
+
+TRACK_BY_SIGNATURE_QUERY = register_query("track_by_signature", """
+SELECT 
+    t.id, 
+    t.name, 
+    t.artist_name, 
+    t.album_name, 
+    t.duration, 
+    l.instrumental,
+    l.plain_lyrics, 
+    l.synced_lyrics,
+    t.last_lyrics_id
+FROM tracks t
+JOIN lyrics l on t.last_lyrics_id = l.id
+WHERE 
+    artist_name_lower =  $1 AND 
+    name_lower = $2 AND  
+    album_name_lower = $3 AND 
+    duration BETWEEN $4-2 AND $4+2
+ORDER BY
+    t.id
+""", SIGNATURE_WARMUP_ARGS)
+
+# fuzzy fallback settings (optional in .env)
+FUZZY_MIN_SCORE = float(os.getenv("FUZZY_MIN_SCORE", "0.5"))
+FUZZY_MAX_DURATION_DIFF = int(os.getenv("FUZZY_MAX_DURATION_DIFF", "5"))
+
+# "feat. X", "(Remastered 2011)", "- 2011 Remaster" and the like
+VERSION_TAGS = re.compile(
+    r"\s*[\(\[]?\s*\b(?:feat\.?|ft\.?|featuring)\s.*$"
+    r"|\s*[\(\[-]\s*(?:\d{4}\s+)?remaster(?:ed)?\b.*$",
+    re.IGNORECASE
+)
+
+# normalizes a signature part for the fuzzy fallback
+def prepare_fuzzy(input: str) -> str:
+    return prepare_input(VERSION_TAGS.sub("", input))
 
-    query = """
+# "" has no trigrams, so % on it reads every row (see fuzzy_searchable).
+# warm up with names that have trigrams but match nothing
+FUZZY_WARMUP_ARGS = ("zzwarmupzz", "zzwarmupzz", "zzwarmupzz", 0, FUZZY_MAX_DURATION_DIFF, FUZZY_MIN_SCORE)
+
+# trigram fallback when the exact signature misses. the % operators are
+# served by the GIN trigram indexes from migration 002, the score weighs
+# track and artist name over album, and ties go to the closest duration
+FUZZY_SIGNATURE_QUERY = register_query("fuzzy_signature", """
+SELECT * FROM (
     SELECT 
         t.id, 
         t.name, 
@@ -195,22 +567,262 @@ async def read_track(artist_name: str, track_name: str, album_name: str, duratio
         t.duration, 
         l.instrumental,
         l.plain_lyrics, 
-        l.synced_lyrics
+        l.synced_lyrics,
+        t.last_lyrics_id,
+        (
+            2 * similarity(t.artist_name_lower, $1) +
+            2 * similarity(t.name_lower, $2) +
+            similarity(t.album_name_lower, $3)
+        ) / 5 AS match_score
     FROM tracks t
     JOIN lyrics l on t.last_lyrics_id = l.id
     WHERE 
-        artist_name_lower =  $1 AND 
-        name_lower = $2 AND  
-        album_name_lower = $3 AND 
-        duration BETWEEN $4-2 AND $4+2
-    ORDER BY
-        t.id
-    """
-    row = await db.fetchrow(query, artist_name, track_name, album_name, duration)
-    if not row:
-        raise HTTPException(status_code=404, detail="Track or Artist not found")
-    return dict(row)
+        artist_name_lower % $1 AND 
+        name_lower % $2 AND 
+        duration BETWEEN $4 - $5 AND $4 + $5
+) m
+WHERE
+    m.match_score >= $6::float8
+ORDER BY
+    m.match_score - 0.01 * abs(m.duration - $4) DESC,
+    m.id
+LIMIT 1
+""", FUZZY_WARMUP_ARGS)
+
+# the fuzzy form of a signature. version tags are stripped from the raw
+# names, prepare_input would already have removed the brackets and dashes
+# that mark them
+def fuzzy_signature(artist_name: str, track_name: str, album_name: str, duration: int) -> tuple:
+    return (prepare_fuzzy(artist_name), prepare_fuzzy(track_name), prepare_fuzzy(album_name), duration)
+
+# pg_trgm gets no trigrams out of an artist or track name shorter than
+# one, so % could only answer it by reading every row and then scoring
+# them 0. names like "feat. Drake" or "!!!" normalize to ""
+FUZZY_MIN_NAME_LENGTH = 3
+
+def fuzzy_searchable(signature: tuple) -> bool:
+    return len(signature[0]) >= FUZZY_MIN_NAME_LENGTH and len(signature[1]) >= FUZZY_MIN_NAME_LENGTH
+
+# best fuzzy match for a signature and its version, (None, None) when
+# nothing scores min_score or the names are too short to search
+async def find_fuzzy_match(
+    signature: tuple, min_score: float, db: asyncpg.Connection
+) -> Tuple[Optional[dict], Optional[Tuple[int, int]]]:
+    if not fuzzy_searchable(signature):
+        return None, None
+    fuzzy_key = ("fuzzy",) + signature + (min_score,)
+    cached = track_cache.get(fuzzy_key)
+    if cached is NOT_FOUND:
+        return None, None
+    if cached is not None:
+        return cached, track_cache.get(etag_key(fuzzy_key))
+
+    track, version = await load_track(
+        fuzzy_key, db, FUZZY_SIGNATURE_QUERY, *signature, FUZZY_MAX_DURATION_DIFF, min_score
+    )
+    if track is NOT_FOUND:
+        return None, None
+    return track, version
+
+@app.get("/get/{artist_name}/{track_name}/{album_name}/{duration}",response_model = dict)
+async def read_track(
+    artist_name: str,
+    track_name: str,
+    album_name: str,
+    duration: int,
+    response: Response,
+    fuzzy: bool = True,
+    min_score: float = Query(FUZZY_MIN_SCORE, ge=0, le=1),
+    if_none_match: Optional[str] = Header(None),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    key = signature_key(artist_name, track_name, album_name, duration)
+    if if_none_match:
+        version = await lookup_version(key, db, VERSION_BY_SIGNATURE_QUERY, *key[1:])
+        if version and etag_matches(if_none_match, track_etag(version)):
+            return not_modified(version)
+
+    cached = track_cache.get(key)
+    if cached is None:
+        # the key holds the signature normalized like the *_lower columns
+        track, version = await load_track(key, db, TRACK_BY_SIGNATURE_QUERY, *key[1:])
+        if track is not NOT_FOUND:
+            set_etag(response, version)
+            return track_response(track, response)
+    elif cached is not NOT_FOUND:
+        set_etag(response, track_cache.get(etag_key(key)))
+        return track_response(cached, response)
+
+    # only reached when the normalized exact lookup missed
+    if fuzzy:
+        signature = fuzzy_signature(artist_name, track_name, album_name, duration)
+        track, version = await find_fuzzy_match(signature, min_score, db)
+        if track is not None:
+            if if_none_match and version and etag_matches(if_none_match, track_etag(version)):
+                return not_modified(version)
+            set_etag(response, version)
+            return track_response(track, response)
+    raise HTTPException(status_code=404, detail="Track or Artist not found")
+
+
+SYNCED_LYRICS_QUERY = register_query("synced_lyrics", """
+SELECT synced_lyrics FROM lyrics WHERE id = $1
+""", (-1,))
+
+# synced lyrics as parallel arrays of millisecond offsets and lines,
+# parsed once per lyrics id. ?t= returns only the line showing at t,
+# ?from=&to= only the lines showing in that window (all in ms)
+@app.get("/get/{id}/synced", response_model=dict)
+async def get_synced(
+    id: int,
+    response: Response,
+    t: Optional[int] = Query(None, ge=0),
+    from_ms: Optional[int] = Query(None, alias="from", ge=0),
+    to_ms: Optional[int] = Query(None, alias="to", ge=0),
+    if_none_match: Optional[str] = Header(None),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    version = await lookup_version(id_key(id), db, VERSION_BY_ID_QUERY, id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Track not found")
+    if if_none_match and etag_matches(if_none_match, track_etag(version)):
+        return not_modified(version)
+
+    lyrics_id = version[1]
+    synced = synced_cache.get(lyrics_id)
+    if synced is None:
+        synced = parse_lrc(await db.fetchval(SYNCED_LYRICS_QUERY, lyrics_id))
+        synced_cache.set(lyrics_id, synced)
+    if not synced.lines:
+        raise HTTPException(status_code=404, detail="Synced lyrics not found")
+
+    set_etag(response, version)
+    result = {"id": id, "lyrics_id": lyrics_id}
+    if t is not None:
+        index = synced.index_at(t)
+        next_index = index + 1
+        result.update({
+            "index": index,
+            "offset_ms": synced.offsets_ms[index] if index >= 0 else None,
+            "line": synced.lines[index] if index >= 0 else None,
+            "next_offset_ms": synced.offsets_ms[next_index] if next_index < len(synced.lines) else None,
+        })
+    elif from_ms is not None or to_ms is not None:
+        start, end = synced.window(from_ms or 0, to_ms if to_ms is not None else synced.offsets_ms[-1])
+        result.update({
+            "start_index": start,
+            "offsets_ms": synced.offsets_ms[start:end].tolist(),
+            "lines": synced.lines[start:end],
+        })
+    else:
+        result.update({
+            "offsets_ms": synced.offsets_ms.tolist(),
+            "lines": synced.lines,
+        })
+    return result
 
+# resolves many ids and signatures in one round trip. each input is
+# numbered so rows can be matched back to it, signatures use the same
+# +-2s duration window and id ordering as read_track
+BATCH_QUERY = register_query("batch", """
+WITH id_input AS (
+    SELECT * FROM unnest($1::bigint[]) WITH ORDINALITY AS i(id, ord)
+),
+sig_input AS (
+    SELECT * FROM unnest($2::text[], $3::text[], $4::text[], $5::int[])
+        WITH ORDINALITY AS s(artist_name, track_name, album_name, duration, ord)
+)
+SELECT 'id' AS kind, i.ord, m.*
+FROM id_input i
+CROSS JOIN LATERAL (
+    SELECT t.id, t.name, t.artist_name, t.album_name, t.duration,
+           l.instrumental, l.plain_lyrics, l.synced_lyrics, t.last_lyrics_id
+    FROM tracks t
+    JOIN lyrics l on t.last_lyrics_id = l.id
+    WHERE t.id = i.id
+) m
+UNION ALL
+SELECT 'sig' AS kind, s.ord, m.*
+FROM sig_input s
+CROSS JOIN LATERAL (
+    SELECT t.id, t.name, t.artist_name, t.album_name, t.duration,
+           l.instrumental, l.plain_lyrics, l.synced_lyrics, t.last_lyrics_id
+    FROM tracks t
+    JOIN lyrics l on t.last_lyrics_id = l.id
+    WHERE
+        t.artist_name_lower = s.artist_name AND
+        t.name_lower = s.track_name AND
+        t.album_name_lower = s.album_name AND
+        t.duration BETWEEN s.duration-2 AND s.duration+2
+    ORDER BY t.id
+    LIMIT 1
+) m
+""", ([], [], [], [], []))
+
+# max ids + signatures accepted by /get/batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+
+# resolves a list of ids and signatures, answers what it can from the cache
+# and looks up the rest with a single query. results line up with the
+# inputs, None means not found
+@app.post("/get/batch", response_model=dict)
+async def read_batch(body: BatchLookup, db: asyncpg.Connection = Depends(get_db)):
+    if len(body.ids) + len(body.signatures) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"At most {BATCH_MAX_ITEMS} ids and signatures per batch")
+
+    id_keys = [id_key(id) for id in body.ids]
+    sig_keys = [signature_key(s.artist_name, s.track_name, s.album_name, s.duration) for s in body.signatures]
+    ids = [track_cache.get(key) for key in id_keys]
+    signatures = [track_cache.get(key) for key in sig_keys]
+
+    missing_ids = [i for i, cached in enumerate(ids) if cached is None]
+    missing_sigs = [i for i, cached in enumerate(signatures) if cached is None]
+    if missing_ids or missing_sigs:
+        rows = await db.fetch(
+            BATCH_QUERY,
+            [body.ids[i] for i in missing_ids],
+            [sig_keys[i][1] for i in missing_sigs],
+            [sig_keys[i][2] for i in missing_sigs],
+            [sig_keys[i][3] for i in missing_sigs],
+            [sig_keys[i][4] for i in missing_sigs],
+        )
+        found_ids = {}
+        found_sigs = {}
+        for row in rows:
+            track = dict(row)
+            kind = track.pop('kind')
+            ord = track.pop('ord')
+            if kind == 'id':
+                found_ids[missing_ids[ord - 1]] = track
+            else:
+                found_sigs[missing_sigs[ord - 1]] = track
+        for i in missing_ids:
+            if i in found_ids:
+                ids[i], _ = cache_track(id_keys[i], found_ids[i])
+            else:
+                ids[i] = NOT_FOUND
+                track_cache.set(id_keys[i], NOT_FOUND)
+        for i in missing_sigs:
+            if i in found_sigs:
+                signatures[i], _ = cache_track(sig_keys[i], found_sigs[i])
+            else:
+                signatures[i] = NOT_FOUND
+                track_cache.set(sig_keys[i], NOT_FOUND)
+
+    return FastJSONResponse({
+        "ids": [None if track is NOT_FOUND else track for track in ids],
+        "signatures": [None if track is NOT_FOUND else track for track in signatures],
+    })
+
+# parses the comma separated fields= parameter of /tracks
+def parse_fields(fields: Optional[str]) -> Optional[set]:
+    if not fields:
+        return None
+    include = {f.strip() for f in fields.split(',') if f.strip()}
+    unknown = include - set(SimpleTrack.model_fields)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return include
 
 # api call to get tracks with an input field of q 
 @app.get("/tracks", response_model=List[SimpleTrack])
@@ -218,13 +830,227 @@ async def search_tracks(
     q: Optional[str] = Query(None, min_length=1, max_length=50),
     track_name: Optional[str] = Query(None, min_length=1, max_length=50),
     artist_name: Optional[str] = Query(None, min_length=1, max_length=50),
-    album_name: Optional[str] = Query(None, min_length=1, max_length=50)
+    album_name: Optional[str] = Query(None, min_length=1, max_length=50),
+    include_lyrics: bool = True,
+    fields: Optional[str] = Query(None, max_length=200),
+    limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, max_length=200),
+    db: asyncpg.Connection = Depends(get_db)
 ):
-    conn = await connect_to_db()
+    include = parse_fields(fields)
+    if include is not None and 'last_lyrics' not in include:
+        include_lyrics = False
     try:
-        tracks = await get_tracks_by_keyword(q, track_name, artist_name, album_name, conn)
-        return tracks
+        tracks, next_cursor = await get_tracks_by_keyword(
+            q, track_name, artist_name, album_name, db, include_lyrics, limit, cursor
+        )
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        if include is None and include_lyrics:
+            return FastJSONResponse(tracks, headers=headers)
+        # lean results, only the requested fields and no lyric text
+        return FastJSONResponse([lean_track(track, include) for track in tracks], headers=headers)
+    except (HTTPException, PoolTimeout):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+# api call to find tracks by a line of their plain lyrics
+@app.get("/tracks/by-lyrics", response_model=List[dict])
+async def search_lyrics(
+    q: str = Query(..., min_length=1, max_length=200),
+    phrase: bool = False,
+    limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, max_length=200),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    hits, next_cursor = await get_tracks_by_lyrics(q, db, phrase, limit, cursor)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return FastJSONResponse(hits, headers=headers)
+
+
+# largest list /suggest will return (optional in .env)
+SUGGEST_MAX_LIMIT = int(os.getenv("SUGGEST_MAX_LIMIT", "50"))
+
+# typeahead over artist and track names, answered from the in-process
+# prefix index without touching the database
+@app.get("/suggest", response_model=List[dict])
+async def suggest(
+    prefix: str = Query(..., min_length=1, max_length=50),
+    limit: int = Query(10, ge=1, le=SUGGEST_MAX_LIMIT)
+):
+    if not suggester.ready:
+        raise HTTPException(status_code=503, detail="Suggestions are not ready yet")
+    with timed_stage("suggest_lookup"):
+        results = suggester.suggest(prepare_input(prefix), limit)
+    return FastJSONResponse(results)
+
+# export settings (optional in .env): rows fetched per cursor round
+# trip, bytes of NDJSON per chunk written to the client, and exports a
+# worker runs at once (each holds a connection until it's done)
+EXPORT_PREFETCH = int(os.getenv("EXPORT_PREFETCH", "1000"))
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", "65536"))
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "2"))
+
+# every filter is optional. ordered by id so an interrupted export can be
+# resumed with min_id. the export's transaction asks for a custom plan,
+# so the planner sees the filters and the unused ones drop out
+EXPORT_QUERY_TEMPLATE = """
+    SELECT
+      tracks.id,
+      tracks.name,
+      tracks.artist_name,
+      tracks.album_name,
+      tracks.duration,
+      coalesce(lyrics.instrumental, false) AS instrumental,{lyric_columns}
+      coalesce(octet_length(lyrics.plain_lyrics), 0) > 0 AS has_plain,
+      coalesce(octet_length(lyrics.synced_lyrics), 0) > 0 AS has_synced,
+      tracks.updated_at
+    FROM
+      tracks
+      LEFT JOIN lyrics ON tracks.last_lyrics_id = lyrics.id
+    WHERE
+      ($1::text IS NULL OR tracks.artist_name_lower = $1::text)
+      AND ($2::bigint IS NULL OR tracks.id >= $2::bigint)
+      AND ($3::bigint IS NULL OR tracks.id <= $3::bigint)
+      AND ($4::boolean IS NULL OR coalesce(lyrics.instrumental, false) = $4::boolean)
+      AND ($5::timestamptz IS NULL OR tracks.updated_at > $5::timestamptz)
+    ORDER BY
+      tracks.id
+    """
+
+# an empty id range, so warming up doesn't export anything
+EXPORT_WARMUP_ARGS = (None, 1, 0, None, None)
+
+EXPORT_QUERY = register_query("export_tracks", EXPORT_QUERY_TEMPLATE.format(lyric_columns="""
+      lyrics.plain_lyrics,
+      lyrics.synced_lyrics,"""), EXPORT_WARMUP_ARGS)
+EXPORT_QUERY_NO_LYRICS = register_query("export_tracks_no_lyrics", EXPORT_QUERY_TEMPLATE.format(lyric_columns=""),
+                                        EXPORT_WARMUP_ARGS)
+
+# exports running in this worker
+active_exports = 0
+
+# streams the rows of an export as NDJSON chunks from a server-side
+# cursor. the cursor fetches EXPORT_PREFETCH rows at a time and only when
+# the previous chunk has been written to the client, so memory stays at
+# one prefetch batch and one chunk however large the export is, and a
+# slow client slows the cursor down. ExportResponse releases the
+# connection and the slot once the response is over
+async def stream_export(db: LazyConnection, query: str, args: tuple, include_lyrics: bool) -> AsyncIterator[bytes]:
+    rows = 0
+    try:
+        conn = await db.get()
+        async with conn.transaction(readonly=True):
+            # one extra statement per export, not per row
+            await conn.execute("SET LOCAL plan_cache_mode = force_custom_plan")
+            source = prepared_statement(conn, query)
+            cursor = source.cursor(*args, prefetch=EXPORT_PREFETCH) if source is not None \
+                else conn.cursor(query, *args, prefetch=EXPORT_PREFETCH)
+            chunk, size = [], 0
+            async for row in cursor:
+                line = dumps(export_row_to_track(row, include_lyrics)) + b"\n"
+                chunk.append(line)
+                size += len(line)
+                rows += 1
+                if size >= EXPORT_CHUNK_BYTES:
+                    yield b"".join(chunk)
+                    chunk, size = [], 0
+            if chunk:
+                yield b"".join(chunk)
     finally:
-        await disconnect_from_db(conn)
+        log_sampled("export rows=%d", rows)
+
+# the export stream, cleaned up however the response ends: finished, the
+# client gone mid-stream, or gone before the stream even started (then
+# the generator's own finally never runs). closing the stream rolls back
+# its transaction before the connection goes back to the pool
+class ExportResponse(StreamingResponse):
+    def __init__(self, content: AsyncIterator[bytes], db: LazyConnection, **kwargs):
+        super().__init__(content, **kwargs)
+        self.db = db
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await finish_export(self.body_iterator, self.db)
+
+async def finish_export(stream: AsyncIterator[bytes], db: LazyConnection):
+    global active_exports
+    try:
+        await stream.aclose()
+        await db.release()
+    finally:
+        active_exports -= 1
+
+# bulk export of tracks as NDJSON, one /get-shaped track per line
+@app.get("/export/tracks")
+async def export_tracks(
+    artist_name: Optional[str] = Query(None, min_length=1, max_length=200),
+    min_id: Optional[int] = Query(None, ge=0),
+    max_id: Optional[int] = Query(None, ge=0),
+    instrumental: Optional[bool] = None,
+    updated_since: Optional[datetime] = None,
+    include_lyrics: bool = False
+):
+    global active_exports
+    if active_exports >= EXPORT_MAX_CONCURRENT:
+        raise HTTPException(status_code=429, detail="Too many exports in progress", headers={"Retry-After": "30"})
+    artist = prepare_input(artist_name) if artist_name else None
+    if artist_name and not artist:
+        raise HTTPException(status_code=422, detail="Invalid artist_name")
+    # timestamps without a zone are UTC
+    if updated_since is not None and updated_since.tzinfo is None:
+        updated_since = updated_since.replace(tzinfo=timezone.utc)
+
+    # the slot is taken before the first await, so requests waiting on
+    # the pool count against the limit too. the connection is borrowed
+    # here, so a busy pool answers 503 before the stream starts, and the
+    # response gives both back
+    active_exports += 1
+    db = LazyConnection()
+    try:
+        await db.get()
+    except BaseException:
+        active_exports -= 1
+        raise
+    query = EXPORT_QUERY if include_lyrics else EXPORT_QUERY_NO_LYRICS
+    args = (artist, min_id, max_id, instrumental, updated_since)
+    return ExportResponse(stream_export(db, query, args, include_lyrics), db, media_type="application/x-ndjson")
+
+# cache counters for /get/{id} and the signature lookup
+@app.get("/admin/cache", response_model=dict, dependencies=[Depends(require_admin)])
+async def cache_stats():
+    return track_cache.stats()
+
+# drops cached lookups by track id, by signature, or everything
+@app.post("/admin/cache/invalidate", response_model=dict, dependencies=[Depends(require_admin)])
+async def invalidate_cache(body: CacheInvalidation):
+    if body.all:
+        return {"invalidated": track_cache.clear()}
+
+    ids = set(body.ids)
+    invalidated = track_cache.invalidate_where(
+        lambda key, value: (key[0] == "id" and key[1] in ids)
+        or (isinstance(value, dict) and value.get("id") in ids)
+        or (key[0] == "etag" and value is not NOT_FOUND and value[0] in ids)
+        or (key[:2] == ("etag", "id") and key[2] in ids)
+    )
+    for sig in body.signatures:
+        key = signature_key(sig.artist_name, sig.track_name, sig.album_name, sig.duration)
+        track_cache.invalidate(etag_key(key))
+        if track_cache.invalidate(key):
+            invalidated += 1
+        # fuzzy matches for the signature, at any min_score
+        signature = fuzzy_signature(sig.artist_name, sig.track_name, sig.album_name, sig.duration)
+        invalidated += track_cache.invalidate_where(
+            lambda cache_key, value: cache_key[0] == "fuzzy" and cache_key[1:5] == signature
+        )
+    return {"invalidated": invalidated}
+
+
+# prometheus metrics: latency histograms per route and per named query,
+# rows returned, payload bytes, in-flight requests and error counts
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
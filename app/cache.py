@@ -0,0 +1,150 @@
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+from dotenv import load_dotenv
+from .normalize import prepare_input
+
+# load env
+load_dotenv()
+
+# cache settings (all optional in .env), 0 means no limit
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", "0"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+CACHE_NEGATIVE_TTL = float(os.getenv("CACHE_NEGATIVE_TTL", "30"))
+
+# parsed synced lyrics never change for a given lyrics id
+SYNCED_CACHE_MAX_ENTRIES = int(os.getenv("SYNCED_CACHE_MAX_ENTRIES", "5000"))
+SYNCED_CACHE_TTL = float(os.getenv("SYNCED_CACHE_TTL", "3600"))
+
+# stored for lookups that found nothing (404s)
+NOT_FOUND = object()
+
+# rough in-memory size of a cached value in bytes
+def estimate_size(value: Any) -> int:
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+# in-process cache with a ttl per entry and least recently used eviction.
+# bounded by an entry count, a byte budget, or both
+class TTLCache:
+    def __init__(self, max_entries: int = 0, max_bytes: int = 0,
+                 ttl: float = 300, negative_ttl: float = 30,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        # key -> (expires_at, size, value)
+        self._entries: OrderedDict = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # returns the cached value, NOT_FOUND for a cached 404, or None on a miss
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, _, value = entry
+        if expires_at <= self.clock():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        ttl = self.negative_ttl if value is NOT_FOUND else self.ttl
+        if ttl <= 0:
+            return
+        size = estimate_size(value)
+        if self.max_bytes and size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (self.clock() + ttl, size, value)
+        self.bytes += size
+        while self._entries and (
+            (self.max_entries and len(self._entries) > self.max_entries)
+            or (self.max_bytes and self.bytes > self.max_bytes)
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        if key in self._entries:
+            self._remove(key)
+            return True
+        return False
+
+    # drops every entry whose key and value match, returns how many went
+    def invalidate_where(self, match: Callable[[Hashable, Any], bool]) -> int:
+        keys = [k for k, (_, _, v) in self._entries.items() if match(k, v)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self) -> int:
+        count = len(self._entries)
+        self._entries.clear()
+        self.bytes = 0
+        return count
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+# cache used by /get/{id} and the signature lookup
+track_cache = TTLCache(
+    max_entries=CACHE_MAX_ENTRIES,
+    max_bytes=CACHE_MAX_BYTES,
+    ttl=CACHE_TTL,
+    negative_ttl=CACHE_NEGATIVE_TTL,
+)
+
+# parsed synced lyrics, keyed by lyrics id
+synced_cache = TTLCache(
+    max_entries=SYNCED_CACHE_MAX_ENTRIES,
+    ttl=SYNCED_CACHE_TTL,
+    negative_ttl=SYNCED_CACHE_TTL,
+)
+
+def id_key(id: int) -> tuple:
+    return ("id", id)
+
+# a signature normalized with prepare_input, the form the *_lower columns
+# hold. read_track, /get/batch and the admin invalidation all build their
+# keys and exact query parameters from it
+def signature_key(artist_name: str, track_name: str, album_name: str, duration: int) -> tuple:
+    return ("sig", prepare_input(artist_name), prepare_input(track_name), prepare_input(album_name), duration)
+
+# (track id, last lyrics id) version of a cached lookup, used for etags
+def etag_key(key: tuple) -> tuple:
+    return ("etag",) + key
@@ -0,0 +1,127 @@
+import gzip
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# brotli and zstd are optional, gzip is always available
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# preferred first
+def available_encodings() -> list:
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+# picks the best encoding the client accepts, None if it accepts none
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    for encoding in available_encodings():
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    if encoding == "br":
+        return brotli.compress(body, quality=4)
+    return gzip.compress(body, compresslevel=6)
+
+# strong etags are per representation, so the encoding is added to them.
+# etag_matches() strips it again when comparing If-None-Match, and a 304
+# carries the client's own tag back (see matched_etag())
+def encoded_etag(etag: str, encoding: str) -> str:
+    if etag.startswith('"') and etag.endswith('"'):
+        return f'{etag[:-1]}-{encoding}"'
+    return etag
+
+def strip_encoding(etag: str) -> str:
+    for encoding in ("zstd", "br", "gzip"):
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+# the If-None-Match tag that matched etag, with its encoding suffix, so a
+# 304 names the representation the client holds. etag when none matches
+def matched_etag(if_none_match: str, etag: str) -> str:
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/")
+        if strip_encoding(tag) == etag:
+            return tag
+    return etag
+
+# compresses responses of at least minimum_size bytes with zstd, brotli or
+# gzip, whichever the client accepts first. all of them get Vary:
+# Accept-Encoding, compressed or not, and a 304 carries the ETag of the
+# representation the client holds. streamed responses (more than one
+# body message) are passed through untouched
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+        if_none_match = request_headers.get("if-none-match")
+
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if more_body or "content-encoding" in headers:
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            headers.add_vary_header("Accept-Encoding")
+            if start_message["status"] == 304 and if_none_match and "etag" in headers:
+                headers["ETag"] = matched_etag(if_none_match, headers["etag"])
+            if encoding is None or len(body) < self.minimum_size or start_message["status"] == 304:
+                await send(start_message)
+                await send(message)
+                return
+
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            if "etag" in headers:
+                headers["ETag"] = encoded_etag(headers["etag"], encoding)
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
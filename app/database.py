@@ -1,15 +1,337 @@
+import asyncio
 import asyncpg
 import os
+import random
+from contextlib import asynccontextmanager
+from typing import Optional
+from urllib.parse import urlparse
 from dotenv import load_dotenv
+from .metrics import logger, timed_query, timed_stage
+from .queries import prepare_statements, prepared_statement, server_settings
 
 # load env
-load_dotenv() 
+load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-async def connect_to_db():
-    conn = await asyncpg.connect(DATABASE_URL)
-    return conn
+# pool settings (all optional in .env)
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "5"))
+DB_POOL_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", "300"))
+# postgres' generic vs custom plan choice for every pooled connection,
+# unset leaves it to postgres (auto)
+DB_PLAN_CACHE_MODE = os.getenv("DB_PLAN_CACHE_MODE") or None
 
-async def disconnect_from_db(conn):
-    await conn.close()
+# read replicas, comma separated (optional). every endpoint is read-only,
+# so all queries go to a healthy replica when there is one
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+# replica health checks (all optional in .env). a replica whose check
+# fails, times out or lags more than REPLICA_MAX_LAG seconds (0 means no
+# limit) is ejected until a later check passes
+REPLICA_HEALTH_INTERVAL = float(os.getenv("REPLICA_HEALTH_INTERVAL", "5"))
+REPLICA_HEALTH_TIMEOUT = float(os.getenv("REPLICA_HEALTH_TIMEOUT", "2"))
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "0"))
+
+# seconds since the last replayed transaction, 0 on a primary and on a
+# replica that has replayed everything it received (so an idle primary
+# doesn't make its replicas look behind)
+LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+END::float8
+"""
+
+# application wide pool on the primary, created by the app lifespan
+pool: Optional[asyncpg.Pool] = None
+
+# event loop the pools belong to
+_pool_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# number of requests currently waiting for a free connection
+waiters = 0
+
+# raised when no connection frees up within DB_POOL_ACQUIRE_TIMEOUT
+class PoolTimeout(Exception):
+    pass
+
+async def open_pool(dsn: str) -> asyncpg.Pool:
+    return await asyncpg.create_pool(
+        dsn,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        max_inactive_connection_lifetime=DB_POOL_MAX_INACTIVE_LIFETIME,
+        init=prepare_statements,
+        server_settings=server_settings(DB_PLAN_CACHE_MODE),
+    )
+
+# the time a replica gets to open its pool or answer LAG_QUERY, never
+# more than the interval between checks
+def health_timeout() -> float:
+    return min(REPLICA_HEALTH_TIMEOUT, REPLICA_HEALTH_INTERVAL)
+
+# host:port/database of a dsn, without the credentials
+def target_name(dsn: Optional[str]) -> str:
+    url = urlparse(dsn or "")
+    return url.netloc.rpartition("@")[2] + url.path or "default"
+
+# a database queries can be routed to, with its pool and routing stats.
+# outstanding counts the connections currently borrowed from it
+class Target:
+    def __init__(self, dsn: str, role: str):
+        self.dsn = dsn
+        self.role = role
+        self.name = target_name(dsn)
+        self.pool: Optional[asyncpg.Pool] = None
+        self.healthy = False
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+        self.lag: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    async def open(self):
+        self.pool = await open_pool(self.dsn)
+        self.healthy = True
+
+    # opens a replica's pool at startup. one that can't be reached within
+    # the health check timeout starts ejected, the health checks keep
+    # trying it
+    async def start(self):
+        timeout = health_timeout()
+        try:
+            await asyncio.wait_for(self.open(), timeout)
+        except asyncio.TimeoutError:
+            self.eject(f"connect timed out after {timeout:g}s")
+        except Exception as e:
+            self.eject(str(e) or type(e).__name__)
+
+    def eject(self, reason: str):
+        self.errors += 1
+        self.last_error = reason
+        if self.healthy:
+            self.healthy = False
+            self.ejections += 1
+            logger.warning("ejected %s %s: %s", self.role, self.name, reason)
+
+    # health check, (re)opens the pool if it isn't open yet. opening the
+    # pool and waiting for a free connection count against the timeout
+    # too, so an unreachable replica or a saturated pool can't hold up
+    # check_replicas past the next round
+    async def check(self):
+        timeout = health_timeout()
+        try:
+            lag = await asyncio.wait_for(self._lag(), timeout)
+        except asyncio.TimeoutError:
+            self.eject(f"health check timed out after {timeout:g}s")
+            return
+        except Exception as e:
+            self.eject(str(e) or type(e).__name__)
+            return
+        self.lag = lag
+        if REPLICA_MAX_LAG and lag > REPLICA_MAX_LAG:
+            self.eject(f"replication lag {lag:.1f}s")
+        elif not self.healthy:
+            self.healthy = True
+            logger.warning("readmitted %s %s", self.role, self.name)
+
+    async def _lag(self) -> float:
+        if self.pool is None:
+            self.pool = await open_pool(self.dsn)
+        return await self.pool.fetchval(LAG_QUERY)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "role": self.role,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejections": self.ejections,
+            "lag_seconds": self.lag,
+            "last_error": self.last_error,
+            "pool": _pool_stats(self.pool),
+        }
+
+primary = Target(DATABASE_URL, "primary")
+replicas = [Target(url, "replica") for url in DATABASE_REPLICA_URLS]
+
+# the replica health check task, running while the pools are open
+_health_task: Optional[asyncio.Task] = None
+
+def targets() -> list:
+    return [primary] + replicas
+
+# open pools, the primary's first
+def pools() -> list:
+    return [target.pool for target in targets() if target.pool is not None]
+
+async def create_pool() -> asyncpg.Pool:
+    global pool, _pool_loop, _health_task
+    loop = asyncio.get_running_loop()
+    if pool is not None and _pool_loop is not loop:
+        # left over from another event loop, they can't be used from this one
+        for target in targets():
+            if target.pool is not None:
+                target.pool.terminate()
+                target.pool = None
+        pool, _health_task = None, None
+    if pool is None:
+        new_pool = await open_pool(DATABASE_URL)
+        if pool is None:
+            pool, _pool_loop = new_pool, loop
+            primary.pool, primary.healthy = new_pool, True
+            # all at once, so startup waits for the slowest replica at
+            # most one health check timeout
+            await asyncio.gather(*(replica.start() for replica in replicas))
+            if replicas:
+                _health_task = loop.create_task(check_replicas())
+        else:
+            # another request created it while we were connecting
+            await new_pool.close()
+    return pool
+
+async def close_pool():
+    global pool, _pool_loop, _health_task
+    if _health_task is not None:
+        _health_task.cancel()
+        _health_task = None
+    if pool is not None:
+        pool, _pool_loop = None, None
+        for target in targets():
+            if target.pool is not None:
+                old_pool, target.pool, target.healthy = target.pool, None, False
+                await old_pool.close()
+
+async def check_replicas():
+    while True:
+        await asyncio.sleep(REPLICA_HEALTH_INTERVAL)
+        await asyncio.gather(*(replica.check() for replica in replicas))
+
+# returns the pool, creating it if the lifespan has not run
+# (e.g. a TestClient used without a with block)
+async def get_pool() -> asyncpg.Pool:
+    if pool is None or _pool_loop is not asyncio.get_running_loop():
+        return await create_pool()
+    return pool
+
+# least outstanding requests over the healthy replicas, ties broken at
+# random. the primary serves reads only when no replica is healthy
+def choose_target() -> Target:
+    candidates = [r for r in replicas if r.healthy and r.pool is not None]
+    if not candidates:
+        return primary
+    least = min(r.outstanding for r in candidates)
+    return random.choice([r for r in candidates if r.outstanding == least])
+
+# borrows a connection from the chosen target's pool and gives it back
+# afterwards. a replica that can't hand out a connection is ejected and
+# the primary is used instead
+@asynccontextmanager
+async def acquire():
+    global waiters
+    await get_pool()
+    target = choose_target()
+    waiters += 1
+    try:
+        try:
+            conn = await target.pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT)
+        except (OSError, asyncpg.PostgresConnectionError, asyncpg.InterfaceError) as e:
+            if target is primary:
+                raise
+            target.eject(str(e) or type(e).__name__)
+            target = primary
+            conn = await target.pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise PoolTimeout()
+    finally:
+        waiters -= 1
+    target.outstanding += 1
+    target.requests += 1
+    try:
+        yield conn
+    finally:
+        target.outstanding -= 1
+        await target.pool.release(conn)
+
+# connection handed out by get_db. it only borrows from the pool on the
+# first query, so requests answered from a cache never touch the pool
+class LazyConnection:
+    def __init__(self):
+        self._ctx = None
+        self._conn: Optional[asyncpg.Connection] = None
+
+    async def get(self) -> asyncpg.Connection:
+        if self._conn is None:
+            ctx = acquire()
+            with timed_stage("pool_acquire"):
+                self._conn = await ctx.__aenter__()
+            self._ctx = ctx
+        return self._conn
+
+    async def release(self):
+        if self._ctx is not None:
+            ctx, self._ctx, self._conn = self._ctx, None, None
+            await ctx.__aexit__(None, None, None)
+
+    # runs a fetch method through the query's prepared statement when
+    # the connection has one
+    @staticmethod
+    async def _run(conn, method: str, query: str, args: tuple, kwargs: dict):
+        stmt = prepared_statement(conn, query)
+        if stmt is not None:
+            return await getattr(stmt, method)(*args, **kwargs)
+        return await getattr(conn, method)(query, *args, **kwargs)
+
+    # every call is timed and labelled with the query's registered name
+    async def execute(self, query: str, *args, **kwargs):
+        conn = await self.get()
+        with timed_query(query):
+            return await conn.execute(query, *args, **kwargs)
+
+    async def fetch(self, query: str, *args, **kwargs):
+        conn = await self.get()
+        with timed_query(query) as result:
+            rows = await self._run(conn, "fetch", query, args, kwargs)
+            result["rows"] = len(rows)
+            return rows
+
+    async def fetchrow(self, query: str, *args, **kwargs):
+        conn = await self.get()
+        with timed_query(query) as result:
+            row = await self._run(conn, "fetchrow", query, args, kwargs)
+            result["rows"] = 0 if row is None else 1
+            return row
+
+    async def fetchval(self, query: str, *args, **kwargs):
+        conn = await self.get()
+        with timed_query(query) as result:
+            value = await self._run(conn, "fetchval", query, args, kwargs)
+            result["rows"] = 0 if value is None else 1
+            return value
+
+def _pool_stats(db_pool: Optional[asyncpg.Pool]) -> dict:
+    if db_pool is None:
+        return {"size": 0, "idle": 0, "in_use": 0,
+                "min_size": DB_POOL_MIN_SIZE, "max_size": DB_POOL_MAX_SIZE}
+    size = db_pool.get_size()
+    idle = db_pool.get_idle_size()
+    return {
+        "size": size,
+        "idle": idle,
+        "in_use": size - idle,
+        "min_size": db_pool.get_min_size(),
+        "max_size": db_pool.get_max_size(),
+    }
+
+# primary pool stats reported by /health
+def pool_stats() -> dict:
+    return {**_pool_stats(pool), "waiters": waiters}
+
+# per-target routing stats reported by /health
+def target_stats() -> list:
+    return [target.stats() for target in targets()]
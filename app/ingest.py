@@ -0,0 +1,227 @@
+# Loads an LRCLIB dump into the tracks and lyrics tables.
+#
+# The dump is either the SQLite database LRCLIB publishes or NDJSON with
+# one track per line, shaped like a /get/{id} response plus an optional
+# "last_lyrics_id" (defaults to the track id) and "updated_at". It is
+# read in bounded batches, the *_lower columns are computed with the
+# same prepare_input rules the API uses, and each batch is loaded with
+# binary COPY into temporary staging tables and upserted from there.
+# Rows that didn't change are left alone, changed rows get a new
+# updated_at so the /suggest index picks them up. The *_lower columns
+# count as changes, so re-ingesting after the prepare_input rules change
+# rewrites them.
+#
+# Runs against the primary in DATABASE_URL:
+#   python -m app.ingest lrclib-db-dump.sqlite3
+#   python -m app.ingest tracks.ndjson.gz --resume
+#   python -m app.ingest lrclib-db-dump.sqlite3 --updated-since 2024-06-01
+#   python -m app.ingest lrclib-db-dump.sqlite3 --dry-run
+#
+# On an empty database, apply migrations/000 first and the other
+# migrations after the first load, so their indexes are built once.
+import argparse
+import asyncio
+import gzip
+import json
+import sqlite3
+import time
+from typing import Iterator, List, Optional, Tuple
+
+import asyncpg
+
+from .normalize import prepare_input
+from .database import DATABASE_URL
+
+TRACK_COLUMNS = ["id", "name", "name_lower", "artist_name", "artist_name_lower",
+                 "album_name", "album_name_lower", "duration", "last_lyrics_id"]
+LYRICS_COLUMNS = ["id", "plain_lyrics", "synced_lyrics", "track_id", "instrumental"]
+
+# a dump row: (id, name, artist_name, album_name, duration,
+# last_lyrics_id, plain_lyrics, synced_lyrics, instrumental). the lyrics
+# id comes from the join, so a dangling last_lyrics_id loads as NULL
+SQLITE_QUERY = """
+SELECT t.id, t.name, t.artist_name, t.album_name, t.duration,
+       l.id, l.plain_lyrics, l.synced_lyrics, l.instrumental
+FROM tracks t
+LEFT JOIN lyrics l ON l.id = t.last_lyrics_id
+WHERE t.id > ? AND (? IS NULL OR t.updated_at > ?)
+ORDER BY t.id
+"""
+
+STAGING_DDL = """
+CREATE TEMP TABLE IF NOT EXISTS lyrics_staging AS
+    SELECT id, plain_lyrics, synced_lyrics, track_id, instrumental FROM lyrics WITH NO DATA;
+CREATE TEMP TABLE IF NOT EXISTS tracks_staging AS
+    SELECT id, name, name_lower, artist_name, artist_name_lower,
+           album_name, album_name_lower, duration, last_lyrics_id FROM tracks WITH NO DATA;
+"""
+
+# lyrics go first, tracks.last_lyrics_id references them
+UPSERT_LYRICS = """
+INSERT INTO lyrics (id, plain_lyrics, synced_lyrics, track_id, instrumental)
+SELECT id, plain_lyrics, synced_lyrics, track_id, instrumental FROM lyrics_staging
+ON CONFLICT (id) DO UPDATE SET
+    plain_lyrics = EXCLUDED.plain_lyrics,
+    synced_lyrics = EXCLUDED.synced_lyrics,
+    track_id = EXCLUDED.track_id,
+    instrumental = EXCLUDED.instrumental,
+    updated_at = now()
+WHERE (lyrics.plain_lyrics, lyrics.synced_lyrics, lyrics.track_id, lyrics.instrumental)
+    IS DISTINCT FROM (EXCLUDED.plain_lyrics, EXCLUDED.synced_lyrics, EXCLUDED.track_id, EXCLUDED.instrumental)
+"""
+
+UPSERT_TRACKS = """
+INSERT INTO tracks (id, name, name_lower, artist_name, artist_name_lower,
+                    album_name, album_name_lower, duration, last_lyrics_id)
+SELECT id, name, name_lower, artist_name, artist_name_lower,
+       album_name, album_name_lower, duration, last_lyrics_id FROM tracks_staging
+ON CONFLICT (id) DO UPDATE SET
+    name = EXCLUDED.name,
+    name_lower = EXCLUDED.name_lower,
+    artist_name = EXCLUDED.artist_name,
+    artist_name_lower = EXCLUDED.artist_name_lower,
+    album_name = EXCLUDED.album_name,
+    album_name_lower = EXCLUDED.album_name_lower,
+    duration = EXCLUDED.duration,
+    last_lyrics_id = EXCLUDED.last_lyrics_id,
+    updated_at = now()
+WHERE (tracks.name, tracks.name_lower, tracks.artist_name, tracks.artist_name_lower,
+       tracks.album_name, tracks.album_name_lower, tracks.duration, tracks.last_lyrics_id)
+    IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.name_lower, EXCLUDED.artist_name, EXCLUDED.artist_name_lower,
+                      EXCLUDED.album_name, EXCLUDED.album_name_lower, EXCLUDED.duration, EXCLUDED.last_lyrics_id)
+"""
+
+def lower(value: Optional[str]) -> Optional[str]:
+    return prepare_input(value) if value else value
+
+# COPY records for one dump row. the lyrics record is None for a track
+# without lyrics
+def to_records(row: tuple) -> Tuple[tuple, Optional[tuple]]:
+    id, name, artist_name, album_name, duration, last_lyrics_id, plain, synced, instrumental = row
+    track = (
+        id,
+        name, lower(name),
+        artist_name, lower(artist_name),
+        album_name, lower(album_name),
+        int(round(duration)) if duration is not None else None,
+        last_lyrics_id,
+    )
+    if last_lyrics_id is None:
+        return track, None
+    return track, (last_lyrics_id, plain, synced, id, bool(instrumental))
+
+def read_sqlite(path: str, after_id: int, updated_since: Optional[str], batch_size: int) -> Iterator[List[tuple]]:
+    # batches are read from a worker thread, one at a time
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    try:
+        cursor = db.execute(SQLITE_QUERY, (after_id, updated_since, updated_since))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+    finally:
+        db.close()
+
+def read_ndjson(path: str, after_id: int, updated_since: Optional[str], batch_size: int) -> Iterator[List[tuple]]:
+    opener = gzip.open if path.endswith(".gz") else open
+    batch = []
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            track = json.loads(line)
+            if track["id"] <= after_id:
+                continue
+            if updated_since and track.get("updated_at") and track["updated_at"] <= updated_since:
+                continue
+            has_lyrics = track.get("plain_lyrics") is not None or track.get("synced_lyrics") is not None \
+                or track.get("instrumental")
+            batch.append((
+                track["id"], track.get("name"), track.get("artist_name"), track.get("album_name"),
+                track.get("duration"),
+                track.get("last_lyrics_id", track["id"]) if has_lyrics else None,
+                track.get("plain_lyrics"), track.get("synced_lyrics"), track.get("instrumental", False),
+            ))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def read_dump(path: str, after_id: int, updated_since: Optional[str], batch_size: int) -> Iterator[List[tuple]]:
+    if path.endswith((".ndjson", ".jsonl", ".ndjson.gz", ".jsonl.gz")):
+        return read_ndjson(path, after_id, updated_since, batch_size)
+    return read_sqlite(path, after_id, updated_since, batch_size)
+
+# COPY records for a batch of dump rows, lyrics deduplicated by id since
+# an upsert can't touch the same row twice
+def to_batch(rows: List[tuple]) -> Tuple[List[tuple], List[tuple]]:
+    tracks, lyrics = [], {}
+    for row in rows:
+        track, lyric = to_records(row)
+        tracks.append(track)
+        if lyric is not None:
+            lyrics[lyric[0]] = lyric
+    return tracks, list(lyrics.values())
+
+# COPYs one batch into the staging tables and upserts it, returns the
+# number of tracks inserted or changed
+async def load_batch(conn: asyncpg.Connection, tracks: List[tuple], lyrics: List[tuple]) -> int:
+    async with conn.transaction():
+        await conn.execute("TRUNCATE lyrics_staging, tracks_staging")
+        await conn.copy_records_to_table("lyrics_staging", records=lyrics, columns=LYRICS_COLUMNS)
+        await conn.copy_records_to_table("tracks_staging", records=tracks, columns=TRACK_COLUMNS)
+        await conn.execute(UPSERT_LYRICS)
+        status = await conn.execute(UPSERT_TRACKS)
+    return int(status.split()[-1])
+
+# reads and converts the next batch in a thread while the current one
+# is loading, so at most two batches are in memory
+async def batches(dump: Iterator[List[tuple]]):
+    it = (to_batch(rows) for rows in dump)
+    pending = asyncio.create_task(asyncio.to_thread(next, it, None))
+    while True:
+        batch = await pending
+        if batch is None:
+            return
+        pending = asyncio.create_task(asyncio.to_thread(next, it, None))
+        yield batch
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("dump", help="LRCLIB SQLite dump, or .ndjson / .jsonl (optionally .gz)")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--after-id", type=int, default=0, help="only load tracks with a larger id")
+    parser.add_argument("--resume", action="store_true", help="continue after the largest track id already loaded")
+    parser.add_argument("--updated-since", help="only load tracks updated after this timestamp")
+    parser.add_argument("--dry-run", action="store_true", help="read and convert the dump without loading it")
+    args = parser.parse_args()
+
+    conn = None if args.dry_run else await asyncpg.connect(DATABASE_URL)
+    try:
+        after_id = args.after_id
+        if conn is not None:
+            if args.resume:
+                after_id = await conn.fetchval("SELECT coalesce(max(id), 0) FROM tracks")
+            await conn.execute(STAGING_DDL)
+
+        start = time.perf_counter()
+        read = changed = 0
+        async for tracks, lyrics in batches(read_dump(args.dump, after_id, args.updated_since, args.batch_size)):
+            if conn is not None:
+                changed += await load_batch(conn, tracks, lyrics)
+            read += len(tracks)
+            elapsed = time.perf_counter() - start
+            print(f"\r{read:,} tracks read, {changed:,} inserted or changed, {read / elapsed:,.0f} rows/s",
+                  end="", flush=True)
+        print()
+        elapsed = time.perf_counter() - start
+        print(f"done in {elapsed:.1f}s after id {after_id}: {read:,} tracks read, {changed:,} inserted or changed, "
+              f"{read / elapsed if elapsed else 0:,.0f} rows/s")
+    finally:
+        if conn is not None:
+            await conn.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+import re
+from array import array
+from bisect import bisect_right
+from typing import List, NamedTuple, Optional, Tuple
+
+# [mm:ss], [mm:ss.x], [mm:ss.xx], [mm:ss.xxx] and the [mm:ss:xx] variant
+TIMESTAMP = re.compile(r"\[(\d+):(\d{1,2})(?:[.:](\d{1,3}))?\]")
+
+# synced lyrics parsed once into parallel arrays, sorted by offset
+class SyncedLyrics(NamedTuple):
+    offsets_ms: array
+    lines: List[str]
+
+    # index of the line showing at time_ms, -1 before the first line
+    def index_at(self, time_ms: int) -> int:
+        return bisect_right(self.offsets_ms, time_ms) - 1
+
+    # lines showing between from_ms and to_ms, starting with the one
+    # already showing at from_ms. returns (start index, end index)
+    def window(self, from_ms: int, to_ms: int) -> Tuple[int, int]:
+        start = max(self.index_at(from_ms), 0)
+        end = bisect_right(self.offsets_ms, to_ms)
+        return start, max(start, end)
+
+def timestamp_ms(minutes: str, seconds: str, fraction: Optional[str]) -> int:
+    ms = (int(minutes) * 60 + int(seconds)) * 1000
+    if fraction:
+        # .5 is 500ms, .05 is 50ms, .005 is 5ms
+        ms += int(fraction.ljust(3, "0"))
+    return ms
+
+# parses an LRC string. lines may carry several timestamps, tags such as
+# [ar:...] and untimed lines are skipped
+def parse_lrc(text: Optional[str]) -> SyncedLyrics:
+    entries = []
+    for raw_line in (text or "").splitlines():
+        pos = 0
+        stamps = []
+        while True:
+            match = TIMESTAMP.match(raw_line, pos)
+            if not match:
+                break
+            stamps.append(timestamp_ms(*match.groups()))
+            pos = match.end()
+        if not stamps:
+            continue
+        line = raw_line[pos:].strip()
+        for ms in stamps:
+            entries.append((ms, line))
+
+    # stable sort keeps the original order of lines sharing a timestamp
+    entries.sort(key=lambda entry: entry[0])
+    return SyncedLyrics(array("q", (ms for ms, _ in entries)), [line for _, line in entries])
@@ -0,0 +1,204 @@
+import logging
+import os
+import random
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Tuple
+from dotenv import load_dotenv
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .queries import query_name
+
+# load env
+load_dotenv()
+
+logger = logging.getLogger("app")
+logger.setLevel(os.getenv("LOG_LEVEL", "WARNING").upper())
+
+# fraction of sampled log events that are written (0 to 1)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+# latency buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# size buckets for rows and payload bytes
+ROW_BUCKETS = (0, 1, 5, 10, 20, 50, 100, 500, 1000)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# writes a debug log line for a random LOG_SAMPLE_RATE share of calls.
+# arguments are only formatted when the line is actually written, and
+# nothing else happens unless the app logger is at DEBUG
+def log_sampled(msg: str, *args):
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < LOG_SAMPLE_RATE:
+        logger.debug(msg, *args)
+
+# cumulative histogram in the prometheus layout
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+# one histogram per label set, e.g. per (method, route)
+class HistogramVec:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.children: Dict[tuple, Histogram] = {}
+
+    def observe(self, label_values: tuple, value: float):
+        child = self.children.get(label_values)
+        if child is None:
+            child = self.children[label_values] = Histogram(self.buckets)
+        child.observe(value)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, child in sorted(self.children.items()):
+            labels = format_labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {child.sum}")
+            lines.append(f"{self.name}_count{{{labels}}} {child.count}")
+        return lines
+
+# counter per label set
+class CounterVec:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, label_values: tuple, amount: float = 1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{{{format_labels(self.labels, label_values)}}} {value}")
+        return lines
+
+def format_labels(names: Tuple[str, ...], values: tuple) -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+request_latency = HistogramVec(
+    "lrclib_http_request_duration_seconds", "Request latency per route.",
+    ("method", "route"), LATENCY_BUCKETS)
+response_bytes = HistogramVec(
+    "lrclib_http_response_bytes", "Response body size per route, after compression.",
+    ("method", "route"), BYTE_BUCKETS)
+request_errors = CounterVec(
+    "lrclib_http_errors_total", "Requests that ended in a 5xx or an exception.",
+    ("method", "route"))
+query_latency = HistogramVec(
+    "lrclib_db_query_duration_seconds", "Database call latency per named query.",
+    ("query",), LATENCY_BUCKETS)
+query_rows = HistogramVec(
+    "lrclib_db_query_rows", "Rows returned per named query.",
+    ("query",), ROW_BUCKETS)
+query_errors = CounterVec(
+    "lrclib_db_query_errors_total", "Database calls that raised, per named query.",
+    ("query",))
+singleflight_calls = CounterVec(
+    "lrclib_singleflight_calls_total", "Lookups that ran a database call, per single-flight group.",
+    ("group",))
+singleflight_coalesced = CounterVec(
+    "lrclib_singleflight_coalesced_total", "Lookups that shared an identical call already in flight, per single-flight group.",
+    ("group",))
+stage_latency = HistogramVec(
+    "lrclib_stage_duration_seconds", "Latency of in-process stages such as pool acquire or model building.",
+    ("stage",), LATENCY_BUCKETS)
+
+# requests currently being handled
+in_flight = 0
+
+# times a database call and records its rows, see database.LazyConnection
+@contextmanager
+def timed_query(sql: str):
+    name = query_name(sql)
+    start = time.perf_counter()
+    result = {"rows": None}
+    try:
+        yield result
+    except Exception:
+        query_errors.inc((name,))
+        raise
+    finally:
+        query_latency.observe((name,), time.perf_counter() - start)
+        if result["rows"] is not None:
+            query_rows.observe((name,), result["rows"])
+
+# times an in-process stage
+@contextmanager
+def timed_stage(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_latency.observe((stage,), time.perf_counter() - start)
+
+def render() -> str:
+    lines = []
+    for metric in (request_latency, response_bytes, request_errors,
+                   query_latency, query_rows, query_errors,
+                   singleflight_calls, singleflight_coalesced, stage_latency):
+        lines.extend(metric.render())
+    lines.append("# HELP lrclib_http_requests_in_flight Requests currently being handled.")
+    lines.append("# TYPE lrclib_http_requests_in_flight gauge")
+    lines.append(f"lrclib_http_requests_in_flight {in_flight}")
+    return "\n".join(lines) + "\n"
+
+# records latency, payload size and errors per route template
+# (/get/{id}, not /get/2) and tracks in-flight requests
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        global in_flight
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        size = 0
+
+        async def send_wrapper(message: Message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            status = 500
+            raise
+        finally:
+            in_flight -= 1
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else "unmatched")
+            request_latency.observe(labels, time.perf_counter() - start)
+            response_bytes.observe(labels, size)
+            if status >= 500:
+                request_errors.inc(labels)
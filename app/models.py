@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel
 
 class SimpleLyrics(BaseModel):
@@ -12,4 +12,21 @@ class SimpleTrack(BaseModel):
     artist_name: str
     album_name: str
     duration: int
-    last_lyrics: Optional[SimpleLyrics]
\ No newline at end of file
+    has_plain: bool = False
+    has_synced: bool = False
+    last_lyrics: Optional[SimpleLyrics]
+
+class TrackSignature(BaseModel):
+    artist_name: str
+    track_name: str
+    album_name: str
+    duration: int
+
+class CacheInvalidation(BaseModel):
+    ids: List[int] = []
+    signatures: List[TrackSignature] = []
+    all: bool = False
+
+class BatchLookup(BaseModel):
+    ids: List[int] = []
+    signatures: List[TrackSignature] = []
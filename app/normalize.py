@@ -0,0 +1,14 @@
+import re
+
+# preprocessing the string by striping
+# whitespace and converting to lowercase. the *_lower columns hold this
+# form, so lookups, cache keys and ingest all go through it
+def prepare_input(input: str) -> str: 
+    input = input.lower()
+    input = re.sub(r"[`~!@#$%^&*()_|+\-=?;:,.<>{}\[\]\\\/]", " ", input)
+    input = re.sub(r"['’]", "", input)
+    
+    # Collapse multiple spaces into a single space
+    input = ' '.join(input.split())
+
+    return input
@@ -0,0 +1,84 @@
+import logging
+from typing import Dict, NamedTuple, Optional
+
+logger = logging.getLogger("app")
+
+PLAN_CACHE_MODES = ("auto", "force_custom_plan", "force_generic_plan")
+
+# a named hot query. warmup_args are used to run it once at startup on
+# every pooled connection. they should match no rows, and find that out
+# cheaply through an index
+class RegisteredQuery(NamedTuple):
+    name: str
+    sql: str
+    warmup_args: Optional[tuple]
+
+# sql text -> query, so call sites keep passing plain SQL
+QUERIES: Dict[str, RegisteredQuery] = {}
+
+# connection -> sql text -> prepared statement, filled by the pool's init
+# hook for every new connection. connections are keyed by their settings
+# object, which is the same whether asked of the raw connection or of
+# the pool's proxy for it, and unlike the backend pid is unique across
+# servers (see the replicas in database.py)
+_statements: Dict[object, dict] = {}
+
+def register_query(name: str, sql: str, warmup_args: Optional[tuple] = None) -> str:
+    QUERIES[sql] = RegisteredQuery(name, sql, warmup_args)
+    return sql
+
+def query_name(sql: str) -> str:
+    query = QUERIES.get(sql)
+    return query.name if query is not None else "other"
+
+# startup parameters for a pool's connections. plan_cache_mode is set
+# for the whole connection, so no query pays for a transaction and a SET
+# per call, and RESET ALL on release keeps it
+def server_settings(plan_cache_mode: Optional[str]) -> dict:
+    if plan_cache_mode in (None, "", "auto"):
+        return {}
+    if plan_cache_mode not in PLAN_CACHE_MODES:
+        raise ValueError(f"plan_cache_mode must be one of {PLAN_CACHE_MODES}")
+    return {"plan_cache_mode": plan_cache_mode}
+
+# pool init hook, prepares every registered query once per connection.
+# a query that fails to prepare (e.g. a migration that hasn't run yet)
+# is logged and left to run unprepared
+async def prepare_statements(conn):
+    key = conn.get_settings()
+    statements = {}
+    for sql, query in QUERIES.items():
+        try:
+            statements[sql] = await conn.prepare(sql)
+        except Exception:
+            logger.warning("could not prepare query %s", query.name, exc_info=True)
+    _statements[key] = statements
+    conn.add_termination_listener(lambda _: _statements.pop(key, None))
+
+# the prepared statement for sql on this connection, if there is one
+def prepared_statement(conn, sql: str):
+    statements = _statements.get(conn.get_settings())
+    if statements is None:
+        return None
+    return statements.get(sql)
+
+# runs every query that has warmup_args once on each idle connection,
+# so the first real requests don't pay for cold catalog and plan caches
+async def warmup(pool):
+    conns = [await pool.acquire() for _ in range(pool.get_idle_size())]
+    try:
+        for conn in conns:
+            for sql, query in QUERIES.items():
+                if query.warmup_args is None:
+                    continue
+                stmt = prepared_statement(conn, sql)
+                try:
+                    if stmt is not None:
+                        await stmt.fetch(*query.warmup_args)
+                    else:
+                        await conn.fetch(sql, *query.warmup_args)
+                except Exception:
+                    logger.warning("warmup of query %s failed", query.name, exc_info=True)
+    finally:
+        for conn in conns:
+            await pool.release(conn)
@@ -0,0 +1,41 @@
+import os
+from dotenv import load_dotenv
+from .suggest import SUGGEST_ENABLED, suggester
+
+# load env
+load_dotenv()
+
+# whether a worker waits for its /suggest index before reporting ready (optional in .env)
+READY_WAIT_FOR_SUGGEST = os.getenv("READY_WAIT_FOR_SUGGEST", "true").lower() == "true"
+
+# whether this worker should get traffic, served at /ready. unlike /health
+# it never touches the database: a worker is ready once its startup
+# warmup is done (and its /suggest index is built), and stops being ready
+# as soon as it starts draining. under app.server a stop signal starts the
+# drain DRAIN_DELAY seconds before the worker stops accepting, so load
+# balancers move away first. under plain uvicorn (main.py) there is no
+# delay: draining is only set by the lifespan shutdown, once the listener
+# is already closed
+class Readiness:
+    def __init__(self):
+        self.warmed = False
+        self.draining = False
+
+    @property
+    def status(self) -> str:
+        if self.draining:
+            return "draining"
+        if not self.warmed:
+            return "warming"
+        if SUGGEST_ENABLED and READY_WAIT_FOR_SUGGEST and not suggester.ready:
+            return "building_suggest_index"
+        return "ready"
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def stats(self) -> dict:
+        return {"status": self.status, "pid": os.getpid()}
+
+readiness = Readiness()
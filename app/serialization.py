@@ -0,0 +1,103 @@
+import html
+import json
+import re
+from typing import Any, Optional
+
+from fastapi.responses import JSONResponse
+
+# orjson is optional, the stdlib encoder is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+# JSON response rendered with orjson. endpoints return it directly, which
+# also skips FastAPI's response_model validation and jsonable_encoder pass,
+# so content must already be plain dicts, lists and scalars
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+# a /tracks row as the dict SimpleTrack.model_dump() would give, without
+# building the two models per row
+def search_row_to_track(row, include_lyrics: bool = True) -> dict:
+    return {
+        "id": row['id'],
+        "name": row['name'],
+        "artist_name": row['artist_name'],
+        "album_name": row['album_name'],
+        "duration": row['duration'],
+        "has_plain": row['has_plain'],
+        "has_synced": row['has_synced'],
+        "last_lyrics": {
+            # empty string is instrumental is TRUE
+            "plain_lyrics": (row['plain_lyrics'] or "") if include_lyrics else None,
+            "synced_lyrics": (row['synced_lyrics'] or "") if include_lyrics else None,
+            "instrumental": row['instrumental'] if row['instrumental'] is not None else False,
+        },
+    }
+
+# ts_headline marks the matches with these control characters rather
+# than HTML tags, so the user-submitted lyric text around them can be
+# escaped before the <b></b> go in
+SNIPPET_START, SNIPPET_STOP = "\x02", "\x03"
+SNIPPET_MATCH = re.compile("\x02([^\x02\x03]*)\x03")
+
+# a ts_headline snippet as HTML: the text escaped, the matches in <b></b>.
+# stray markers from the lyrics themselves are dropped
+def snippet_html(snippet: Optional[str]) -> Optional[str]:
+    if snippet is None:
+        return None
+    escaped = SNIPPET_MATCH.sub(r"<b>\1</b>", html.escape(snippet, quote=False))
+    return escaped.replace(SNIPPET_START, "").replace(SNIPPET_STOP, "")
+
+# a /tracks/by-lyrics row: the track, its lyric flags and the matching
+# snippet, never the full lyric text
+def lyrics_row_to_hit(row) -> dict:
+    return {
+        "id": row['id'],
+        "name": row['name'],
+        "artist_name": row['artist_name'],
+        "album_name": row['album_name'],
+        "duration": row['duration'],
+        "instrumental": row['instrumental'] if row['instrumental'] is not None else False,
+        "has_plain": row['has_plain'],
+        "has_synced": row['has_synced'],
+        "snippet": snippet_html(row['snippet']),
+    }
+
+# an /export/tracks row, a /get shape without the lookup-only fields.
+# updated_at is written as ISO 8601 so the stdlib encoder can take it
+def export_row_to_track(row, include_lyrics: bool = False) -> dict:
+    track = {
+        "id": row['id'],
+        "name": row['name'],
+        "artist_name": row['artist_name'],
+        "album_name": row['album_name'],
+        "duration": row['duration'],
+        "instrumental": row['instrumental'],
+        "has_plain": row['has_plain'],
+        "has_synced": row['has_synced'],
+        "updated_at": row['updated_at'].isoformat(),
+    }
+    if include_lyrics:
+        track["plain_lyrics"] = row['plain_lyrics']
+        track["synced_lyrics"] = row['synced_lyrics']
+    return track
+
+# same as SimpleTrack.model_dump(include=include, exclude_none=True)
+def lean_track(track: dict, include: Optional[set]) -> dict:
+    lean = {}
+    for field, value in track.items():
+        if include is not None and field not in include:
+            continue
+        if isinstance(value, dict):
+            value = {k: v for k, v in value.items() if v is not None}
+        if value is not None:
+            lean[field] = value
+    return lean
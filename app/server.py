@@ -0,0 +1,106 @@
+# Production entry point: N uvicorn worker processes sharing one socket.
+#
+#   python -m app.server --workers 4 --port 8000
+#
+# main.py stays the single-process dev server with reload. Each worker
+# opens its own pools (so up to DB_POOL_MAX_SIZE connections per worker
+# per target), warms them up and builds its /suggest index before /ready
+# reports it ready. uvloop and httptools are used when installed.
+#
+# On SIGTERM or SIGINT a worker reports draining on /ready, keeps serving
+# for DRAIN_DELAY seconds so load balancers can take it out, then stops
+# accepting, lets in-flight requests finish (at most GRACEFUL_TIMEOUT
+# seconds) and closes its pools. A second signal exits right away,
+# cutting off in-flight requests.
+import argparse
+import asyncio
+import importlib.util
+import logging
+import os
+from typing import Optional
+from dotenv import load_dotenv
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+from .metrics import logger
+from .readiness import readiness
+
+# key=value log lines from the app logger, level set by LOG_LEVEL
+logging.basicConfig(format="ts=%(asctime)s level=%(levelname)s logger=%(name)s %(message)s")
+
+# load env
+load_dotenv()
+
+# server settings (all optional in .env, overridden by the flags)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0")) or os.cpu_count() or 1
+DRAIN_DELAY = float(os.getenv("DRAIN_DELAY", "5"))
+GRACEFUL_TIMEOUT = float(os.getenv("GRACEFUL_TIMEOUT", "30"))
+
+# the fastest event loop and HTTP parser that are installed
+def event_loop() -> str:
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+def http_protocol() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+# uvicorn server that reports draining on /ready before it shuts down.
+# a second signal cancels the rest of the delay and exits right away,
+# without waiting for in-flight requests
+class DrainingServer(uvicorn.Server):
+    def __init__(self, config: uvicorn.Config, drain_delay: float = DRAIN_DELAY):
+        super().__init__(config)
+        self.drain_delay = drain_delay
+        self.drain_timer: Optional[asyncio.TimerHandle] = None
+
+    def handle_exit(self, sig, frame):
+        if readiness.draining:
+            if self.drain_timer is not None:
+                self.drain_timer.cancel()
+            super().handle_exit(sig, frame)
+            self.force_exit = True
+            return
+        readiness.draining = True
+        if self.drain_delay <= 0:
+            super().handle_exit(sig, frame)
+            return
+        logger.warning("draining for %.1fs before shutdown", self.drain_delay)
+        # called from a signal handler, hand the timer to the loop safely
+        loop = asyncio.get_event_loop()
+        loop.call_soon_threadsafe(self._start_drain_timer, loop, sig, frame)
+
+    def _start_drain_timer(self, loop: asyncio.AbstractEventLoop, sig, frame):
+        if not self.should_exit:
+            self.drain_timer = loop.call_later(self.drain_delay, super().handle_exit, sig, frame)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY, help="worker processes, defaults to the core count")
+    parser.add_argument("--drain-delay", type=float, default=DRAIN_DELAY,
+                        help="seconds to keep serving after a stop signal while /ready reports draining")
+    parser.add_argument("--graceful-timeout", type=float, default=GRACEFUL_TIMEOUT,
+                        help="seconds to wait for in-flight requests once the worker stops accepting")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+
+    config = uvicorn.Config(
+        "app.api:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=event_loop(),
+        http=http_protocol(),
+        lifespan="on",
+        access_log=args.access_log,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+    server = DrainingServer(config, args.drain_delay)
+    logger.info("starting %d workers on %s:%d (loop=%s, http=%s)",
+                args.workers, args.host, args.port, config.loop, config.http)
+    if args.workers > 1:
+        Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+    else:
+        server.run()
+
+if __name__ == "__main__":
+    main()
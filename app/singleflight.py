@@ -0,0 +1,69 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+
+from .metrics import singleflight_calls, singleflight_coalesced
+
+# one in-flight call, shared by every request that asked for its key
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+# runs at most one call per key at a time. requests that arrive while a
+# call for their key is in flight await it and share its result or its
+# exception, nothing is kept once it completes (track_cache does that).
+#
+# the call runs on the first request's connection, so that request
+# stays until the call completes even when it is cancelled, as long as
+# others are waiting on it. a follower that is cancelled just leaves,
+# and the call is only cancelled when its first request is the last
+# one waiting. it is forgotten before it is cancelled, so nobody joins
+# it on the way out, and a follower that finds it cancelled anyway (it
+# wasn't, only the call was) starts over with a call of its own
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        call = self._calls.get(key)
+        owner = call is None
+        if owner:
+            call = self._calls[key] = _Call(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            singleflight_calls.inc((self.name,))
+        else:
+            singleflight_coalesced.inc((self.name,))
+
+        call.waiters += 1
+        try:
+            # raises CancelledError only when this request is cancelled
+            await asyncio.wait([call.task])
+        except asyncio.CancelledError:
+            if owner and not call.task.done():
+                if call.waiters == 1:
+                    self._drop(key, call)
+                    call.task.cancel()
+                else:
+                    await asyncio.wait([call.task])
+            raise
+        finally:
+            call.waiters -= 1
+        if call.task.cancelled() and not owner:
+            return await self.do(key, fn)
+        return call.task.result()
+
+    def _drop(self, key: Hashable, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def _forget(self, key: Hashable, call: _Call):
+        self._drop(key, call)
+        # the exception was handed to every waiter, or nobody is left to want it
+        if not call.task.cancelled():
+            call.task.exception()
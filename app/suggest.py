@@ -0,0 +1,334 @@
+import asyncio
+import os
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from heapq import heappop, heappush, nlargest
+from typing import Callable, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+from .metrics import logger
+
+# load env
+load_dotenv()
+
+# suggestion index settings (all optional in .env)
+SUGGEST_ENABLED = os.getenv("SUGGEST_ENABLED", "true").lower() == "true"
+SUGGEST_MAX_ENTRIES = int(os.getenv("SUGGEST_MAX_ENTRIES", "2000000"))
+SUGGEST_REFRESH_INTERVAL = float(os.getenv("SUGGEST_REFRESH_INTERVAL", "60"))
+SUGGEST_REBUILD_INTERVAL = float(os.getenv("SUGGEST_REBUILD_INTERVAL", "86400"))
+SUGGEST_MAX_DELTA = int(os.getenv("SUGGEST_MAX_DELTA", "50000"))
+SUGGEST_SNAPSHOT_BATCH = int(os.getenv("SUGGEST_SNAPSHOT_BATCH", "10000"))
+
+ARTIST, TRACK = 0, 1
+
+# one row per distinct (track name, artist) with lyrics. releases is the
+# number of tracks rows sharing it, used as the popularity weight. only
+# the $1 heaviest come back, so the cap on entries also caps what a
+# worker holds while building (artist weights only count those rows)
+SNAPSHOT_QUERY = """
+SELECT min(id) AS id, min(name) AS name, min(artist_name) AS artist_name, count(*) AS releases
+FROM tracks
+WHERE last_lyrics_id IS NOT NULL AND name IS NOT NULL AND artist_name IS NOT NULL
+GROUP BY name_lower, artist_name_lower
+ORDER BY releases DESC
+LIMIT $1
+"""
+
+# the same rows, limited to groups with a track changed since $1
+DELTA_QUERY = """
+SELECT min(id) AS id, min(name) AS name, min(artist_name) AS artist_name, count(*) AS releases
+FROM tracks
+WHERE last_lyrics_id IS NOT NULL AND name IS NOT NULL AND artist_name IS NOT NULL
+  AND (name_lower, artist_name_lower) IN (
+      SELECT name_lower, artist_name_lower FROM tracks WHERE updated_at > $1
+  )
+GROUP BY name_lower, artist_name_lower
+"""
+
+# rows committed after a snapshot started can carry an older updated_at,
+# so each delta re-reads a little before the snapshot time
+SNAPSHOT_OVERLAP = "5 minutes"
+
+# read-only sorted prefix index over normalized artist and track names.
+# entries live in parallel arrays sorted by key, keys and track names are
+# packed into one string each with an offsets array, and artist names
+# are stored once and referenced by index. a segment tree over the
+# weights gives the top entries of any key range without scanning it
+class PrefixIndex:
+    def __init__(self, keys: str, key_offsets: array, names: str, name_offsets: array,
+                 kinds: array, ids: array, weights: array, artist_refs: array, artists: List[str]):
+        self._keys = keys
+        self._key_offsets = key_offsets
+        self._names = names
+        self._name_offsets = name_offsets
+        self._kinds = kinds
+        self._ids = ids
+        self._weights = weights
+        self._artist_refs = artist_refs
+        self._artists = artists
+        self._build_tree()
+
+    def __len__(self) -> int:
+        return len(self._kinds)
+
+    def key(self, i: int) -> str:
+        return self._keys[self._key_offsets[i]:self._key_offsets[i + 1]]
+
+    # tree[size + i] is entry i, every inner node holds the index of the
+    # heaviest entry below it (-1 for padding)
+    def _build_tree(self):
+        n = len(self)
+        size = 1
+        while size < n:
+            size *= 2
+        tree = array("i", [-1]) * (2 * size)
+        tree[size:size + n] = array("i", range(n))
+        weights = self._weights
+        for node in range(size - 1, 0, -1):
+            left, right = tree[2 * node], tree[2 * node + 1]
+            if right < 0 or (left >= 0 and weights[left] >= weights[right]):
+                tree[node] = left
+            else:
+                tree[node] = right
+        self._size = size
+        self._tree = tree
+
+    # heaviest entry in [lo, hi), -1 when the range is empty
+    def _argmax(self, lo: int, hi: int) -> int:
+        tree, weights = self._tree, self._weights
+        best = -1
+        lo += self._size
+        hi += self._size
+        while lo < hi:
+            if lo & 1:
+                i = tree[lo]
+                if best < 0 or weights[i] > weights[best] or (weights[i] == weights[best] and i < best):
+                    best = i
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                i = tree[hi]
+                if best < 0 or weights[i] > weights[best] or (weights[i] == weights[best] and i < best):
+                    best = i
+            lo >>= 1
+            hi >>= 1
+        return best
+
+    # entries whose key starts with prefix, as a [lo, hi) range
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        entries = range(len(self))
+        lo = bisect_left(entries, prefix, key=self.key)
+        hi = bisect_left(entries, prefix + "\U0010ffff", lo, key=self.key)
+        return lo, hi
+
+    # the limit heaviest entries starting with prefix, heaviest first.
+    # each step splits the range around the last pick, so a lookup costs
+    # O(limit * log n) whatever the size of the range
+    def top(self, prefix: str, limit: int) -> List[int]:
+        lo, hi = self.prefix_range(prefix)
+        heap = []
+        best = self._argmax(lo, hi)
+        if best >= 0:
+            heap.append((-self._weights[best], best, lo, hi))
+        result = []
+        while heap and len(result) < limit:
+            _, i, lo, hi = heappop(heap)
+            result.append(i)
+            for sub_lo, sub_hi in ((lo, i), (i + 1, hi)):
+                j = self._argmax(sub_lo, sub_hi)
+                if j >= 0:
+                    heappush(heap, (-self._weights[j], j, sub_lo, sub_hi))
+        return result
+
+    def entry(self, i: int) -> dict:
+        artist = self._artists[self._artist_refs[i]]
+        if self._kinds[i] == ARTIST:
+            return {"kind": "artist", "artist_name": artist, "weight": self._weights[i]}
+        return {
+            "kind": "track",
+            "id": self._ids[i],
+            "name": self._names[self._name_offsets[i]:self._name_offsets[i + 1]],
+            "artist_name": artist,
+            "weight": self._weights[i],
+        }
+
+    # approximate resident size of the index
+    def nbytes(self) -> int:
+        arrays = (self._key_offsets, self._name_offsets, self._kinds, self._ids,
+                  self._weights, self._artist_refs, self._tree)
+        return (sys.getsizeof(self._keys) + sys.getsizeof(self._names)
+                + sum(a.buffer_info()[1] * a.itemsize for a in arrays)
+                + sys.getsizeof(self._artists) + sum(sys.getsizeof(a) for a in self._artists))
+
+# packs (id, name, artist_name, releases) rows into an index as they
+# arrive, so a snapshot never has to be held as rows. artists get an
+# entry weighted by their total releases, tracks one weighted by their
+# own. past max_entries only the heaviest entries are kept
+class IndexBuilder:
+    def __init__(self, normalize: Callable[[str], str], max_entries: int = SUGGEST_MAX_ENTRIES):
+        self.normalize = normalize
+        self.max_entries = max_entries
+        self.keys: List[str] = []
+        self.names: List[str] = []
+        self.kinds = array("b")
+        self.ids = array("q")
+        self.weights = array("I")
+        self.artist_refs = array("i")
+        self.artists: List[str] = []
+        self.artist_index = {}
+
+    def add(self, rows: Iterable[tuple]):
+        normalize, artist_index, artists = self.normalize, self.artist_index, self.artists
+        keys, names, kinds, ids = self.keys, self.names, self.kinds, self.ids
+        weights, artist_refs = self.weights, self.artist_refs
+        for id, name, artist_name, releases in rows:
+            artist_key = normalize(artist_name)
+            key = normalize(name)
+            if not artist_key or not key:
+                continue
+            ref = artist_index.get(artist_key)
+            if ref is None:
+                ref = artist_index[artist_key] = len(artists)
+                artists.append(sys.intern(artist_name))
+                # the artist's own entry, weighed up in build()
+                keys.append(artist_key)
+                names.append("")
+                kinds.append(ARTIST)
+                ids.append(-1)
+                weights.append(0)
+                artist_refs.append(ref)
+            keys.append(key)
+            names.append(name)
+            kinds.append(TRACK)
+            ids.append(id)
+            weights.append(releases)
+            artist_refs.append(ref)
+
+    def build(self) -> PrefixIndex:
+        keys, names, kinds, ids = self.keys, self.names, self.kinds, self.ids
+        weights, artist_refs, artists = self.weights, self.artist_refs, self.artists
+
+        # artist weight is the sum of its tracks' releases
+        artist_weights = array("I", [0]) * len(artists)
+        for i in range(len(kinds)):
+            if kinds[i] == TRACK:
+                artist_weights[artist_refs[i]] += weights[i]
+        for i in range(len(kinds)):
+            if kinds[i] == ARTIST:
+                weights[i] = artist_weights[artist_refs[i]]
+
+        entries = range(len(keys))
+        if len(keys) > self.max_entries:
+            entries = nlargest(self.max_entries, entries, key=weights.__getitem__)
+        order = sorted(entries, key=keys.__getitem__)
+
+        key_offsets = array("I", [0])
+        name_offsets = array("I", [0])
+        for i in order:
+            key_offsets.append(key_offsets[-1] + len(keys[i]))
+            name_offsets.append(name_offsets[-1] + len(names[i]))
+        return PrefixIndex(
+            "".join(keys[i] for i in order), key_offsets,
+            "".join(names[i] for i in order), name_offsets,
+            array("b", (kinds[i] for i in order)),
+            array("q", (ids[i] for i in order)),
+            array("I", (weights[i] for i in order)),
+            array("i", (artist_refs[i] for i in order)),
+            artists,
+        )
+
+# builds an index from rows already in hand
+def build_index(rows: Iterable[tuple], normalize: Callable[[str], str],
+                max_entries: int = SUGGEST_MAX_ENTRIES) -> PrefixIndex:
+    builder = IndexBuilder(normalize, max_entries)
+    builder.add(rows)
+    return builder.build()
+
+# the index served by /suggest: a full snapshot plus a small delta of
+# the groups changed since, rebuilt from the snapshot time on every
+# refresh. entries in both are merged, keeping the heavier one. tracks
+# that lose their lyrics stay listed until the next full rebuild
+class Suggester:
+    def __init__(self):
+        self.index: Optional[PrefixIndex] = None
+        self.delta: Optional[PrefixIndex] = None
+        self.snapshot_at = None
+        self.built_at = 0.0
+        self.build_seconds = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.index is not None
+
+    def suggest(self, prefix: str, limit: int) -> List[dict]:
+        if not prefix or self.index is None:
+            return []
+        results = {}
+        for index in (self.index, self.delta):
+            if index is None:
+                continue
+            for i in index.top(prefix, limit):
+                entry = index.entry(i)
+                identity = (entry["kind"], index.key(i), entry["artist_name"].lower())
+                if identity not in results or results[identity]["weight"] < entry["weight"]:
+                    results[identity] = entry
+        ranked = sorted(results.values(), key=lambda e: -e["weight"])[:limit]
+        for entry in ranked:
+            del entry["weight"]
+        return ranked
+
+    # full snapshot of the SUGGEST_MAX_ENTRIES heaviest groups, read
+    # through a cursor SUGGEST_SNAPSHOT_BATCH rows at a time and packed
+    # batch by batch, so only one batch is held as rows.
+    # the cpu-bound packing and build run in a thread so the event loop
+    # keeps serving requests meanwhile
+    async def rebuild(self, conn, normalize: Callable[[str], str]):
+        start = time.perf_counter()
+        builder = IndexBuilder(normalize)
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            snapshot_at = await conn.fetchval(f"SELECT now() - interval '{SNAPSHOT_OVERLAP}'")
+            cursor = await conn.cursor(SNAPSHOT_QUERY, SUGGEST_MAX_ENTRIES)
+            while rows := await cursor.fetch(SUGGEST_SNAPSHOT_BATCH):
+                await asyncio.to_thread(builder.add, rows)
+        index = await asyncio.to_thread(builder.build)
+        del builder
+        self.index, self.delta, self.snapshot_at = index, None, snapshot_at
+        self.built_at = time.time()
+        self.build_seconds = time.perf_counter() - start
+        logger.info("suggest index built: %d entries, %d bytes in %.1fs",
+                    len(index), index.nbytes(), self.build_seconds)
+
+    # groups changed since the snapshot. returns False when the delta has
+    # grown past SUGGEST_MAX_DELTA and a full rebuild is due instead
+    async def refresh(self, conn, normalize: Callable[[str], str]) -> bool:
+        rows = await conn.fetch(DELTA_QUERY, self.snapshot_at)
+        if len(rows) > SUGGEST_MAX_DELTA:
+            return False
+        self.delta = await asyncio.to_thread(build_index, rows, normalize) if rows else None
+        return True
+
+    # background task started by the app lifespan
+    async def run(self, acquire, normalize: Callable[[str], str]):
+        while True:
+            try:
+                async with acquire() as conn:
+                    if (self.index is None or time.time() - self.built_at > SUGGEST_REBUILD_INTERVAL
+                            or not await self.refresh(conn, normalize)):
+                        await self.rebuild(conn, normalize)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("suggest index refresh failed")
+            await asyncio.sleep(SUGGEST_REFRESH_INTERVAL)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "entries": len(self.index) if self.index is not None else 0,
+            "delta_entries": len(self.delta) if self.delta is not None else 0,
+            "bytes": self.index.nbytes() if self.index is not None else 0,
+            "build_seconds": round(self.build_seconds, 2),
+        }
+
+suggester = Suggester()
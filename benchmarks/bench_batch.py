@@ -0,0 +1,71 @@
+# POST /get/batch against the N-request loop it replaces.
+#
+# Picks two disjoint random samples of tracks from the database (so neither
+# run is helped by the other's cache entries), then times:
+#   * loop:  one GET /get/{artist}/{track}/{album}/{duration} per track
+#   * batch: a single POST /get/batch with all signatures
+#
+# Start the API first (python main.py), then:
+#   python -m benchmarks.bench_batch --n 200 --url http://127.0.0.1:8000
+import argparse
+import asyncio
+import os
+import time
+from urllib.parse import quote
+
+import asyncpg
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv("app/.env")
+
+async def sample_signatures(n: int) -> list:
+    conn = await asyncpg.connect(os.getenv("DATABASE_URL"))
+    try:
+        rows = await conn.fetch(
+            """
+            SELECT artist_name, name AS track_name, album_name, duration
+            FROM tracks TABLESAMPLE SYSTEM (1)
+            WHERE last_lyrics_id IS NOT NULL
+            LIMIT $1
+            """,
+            n * 2,
+        )
+    finally:
+        await conn.close()
+    return [dict(r) for r in rows]
+
+async def run_loop(client: httpx.AsyncClient, signatures: list) -> float:
+    start = time.perf_counter()
+    for s in signatures:
+        path = "/".join(quote(str(s[k]), safe="") for k in ("artist_name", "track_name", "album_name", "duration"))
+        await client.get(f"/get/{path}")
+    return time.perf_counter() - start
+
+async def run_batch(client: httpx.AsyncClient, signatures: list) -> float:
+    start = time.perf_counter()
+    response = await client.post("/get/batch", json={"signatures": signatures})
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    args = parser.parse_args()
+
+    signatures = await sample_signatures(args.n)
+    half = len(signatures) // 2
+    loop_sample, batch_sample = signatures[:half], signatures[half:]
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        loop_time = await run_loop(client, loop_sample)
+        batch_time = await run_batch(client, batch_sample)
+
+    print(f"loop:  {len(loop_sample)} requests in {loop_time * 1000:.1f} ms")
+    print(f"batch: {len(batch_sample)} signatures in {batch_time * 1000:.1f} ms")
+    if batch_time:
+        print(f"speedup: {loop_time / batch_time:.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
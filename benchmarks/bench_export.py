@@ -0,0 +1,100 @@
+# Resident memory and throughput of the /export/tracks stream.
+#
+# Runs stream_export in-process against the tracks table of the database
+# in the env (seed millions of rows first with benchmarks.seed) and
+# samples this process's RSS as the NDJSON chunks are consumed. The RSS
+# should stay flat however many rows go by. --read-delay sleeps after
+# every chunk to play a slow client, and --compare-fetch also loads the
+# same rows with a single fetch() to show what buffering the whole result
+# would cost.
+#
+#   python -m benchmarks.seed --tracks 3000000
+#   python -m benchmarks.bench_export
+#   python -m benchmarks.bench_export --include-lyrics --max-id 500000 --compare-fetch
+import argparse
+import asyncio
+import time
+
+from app import api
+from app.database import LazyConnection, close_pool, create_pool
+from benchmarks.bench_suggest import rss_bytes
+
+MiB = 1024 * 1024
+
+async def export(args: tuple, include_lyrics: bool, read_delay: float, samples: int, expected: int):
+    query = api.EXPORT_QUERY if include_lyrics else api.EXPORT_QUERY_NO_LYRICS
+    api.active_exports += 1
+    db = LazyConnection()
+    stream = api.stream_export(db, query, args, include_lyrics)
+    try:
+        await consume(stream, read_delay, samples, expected)
+    finally:
+        await api.finish_export(stream, db)
+
+async def consume(stream, read_delay: float, samples: int, expected: int):
+
+    every = max(1, expected // samples)
+    next_sample = every
+    start_rss = peak_rss = rss_bytes()
+    rows = size = 0
+    start = time.perf_counter()
+    print(f"{'rows':>12} {'MiB sent':>10} {'RSS MiB':>9} {'rows/s':>10}")
+    async for chunk in stream:
+        rows += chunk.count(b"\n")
+        size += len(chunk)
+        rss = rss_bytes()
+        peak_rss = max(peak_rss, rss)
+        if rows >= next_sample:
+            next_sample += every
+            print(f"{rows:>12,} {size / MiB:>10.1f} {rss / MiB:>9.1f} "
+                  f"{rows / (time.perf_counter() - start):>10,.0f}")
+        if read_delay:
+            await asyncio.sleep(read_delay)
+    elapsed = time.perf_counter() - start
+    print(f"\nexported {rows:,} rows ({size / MiB:,.1f} MiB) in {elapsed:.1f}s, {rows / elapsed:,.0f} rows/s")
+    print(f"RSS start {start_rss / MiB:.1f} MiB, peak {peak_rss / MiB:.1f} MiB "
+          f"(+{(peak_rss - start_rss) / MiB:.1f} MiB), end {rss_bytes() / MiB:.1f} MiB")
+
+# the same rows loaded with one fetch(), buffered in full
+async def fetch_all(args: tuple, include_lyrics: bool):
+    query = api.EXPORT_QUERY if include_lyrics else api.EXPORT_QUERY_NO_LYRICS
+    db = LazyConnection()
+    start_rss = rss_bytes()
+    try:
+        rows = await db.fetch(query, *args)
+        print(f"\nfetch(): {len(rows):,} rows, RSS +{(rss_bytes() - start_rss) / MiB:.1f} MiB")
+    finally:
+        await db.release()
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--artist", help="artist_name filter, as the endpoint takes it")
+    parser.add_argument("--min-id", type=int)
+    parser.add_argument("--max-id", type=int)
+    parser.add_argument("--include-lyrics", action="store_true")
+    parser.add_argument("--read-delay", type=float, default=0.0, help="seconds to sleep after every chunk")
+    parser.add_argument("--samples", type=int, default=20, help="RSS lines to print")
+    parser.add_argument("--compare-fetch", action="store_true")
+    args = parser.parse_args()
+
+    await create_pool()
+    try:
+        filters = (api.prepare_input(args.artist) if args.artist else None, args.min_id, args.max_id, None, None)
+        db = LazyConnection()
+        try:
+            conn = await db.get()
+            expected = await conn.fetchval(
+                "SELECT count(*) FROM tracks WHERE id BETWEEN coalesce($1::bigint, 0) AND coalesce($2::bigint, 9223372036854775807)",
+                args.min_id, args.max_id)
+        finally:
+            await db.release()
+        print(f"exporting up to {expected:,} rows, prefetch {api.EXPORT_PREFETCH}, "
+              f"chunks of {api.EXPORT_CHUNK_BYTES} bytes\n")
+        await export(filters, args.include_lyrics, args.read_delay, args.samples, expected)
+        if args.compare_fetch:
+            await fetch_all(filters, args.include_lyrics)
+    finally:
+        await close_pool()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+# Before/after EXPLAIN ANALYZE for the /tracks full-text search.
+#
+# Seeds a scratch schema (bench_fts) with N tracks, runs the old
+# query (to_tsvector computed per row) and the new one (stored
+# search_vector + GIN index, ranked with ts_rank_cd) and prints both plans.
+#
+#   python -m benchmarks.bench_fts --rows 1000000 --q "love you"
+#
+# The scratch schema is dropped at the end unless --keep is passed.
+import argparse
+import asyncio
+import time
+
+from app.api import build_fts_terms, prepare_input
+from benchmarks.common import connect, migration_statements
+
+SCHEMA = "bench_fts"
+
+SEED = f"""
+CREATE SCHEMA {SCHEMA};
+CREATE TABLE {SCHEMA}.lyrics (
+    id bigint PRIMARY KEY,
+    instrumental boolean NOT NULL DEFAULT false,
+    plain_lyrics text,
+    synced_lyrics text
+);
+CREATE TABLE {SCHEMA}.tracks (
+    id bigint PRIMARY KEY,
+    name text, name_lower text,
+    artist_name text, artist_name_lower text,
+    album_name text, album_name_lower text,
+    duration integer,
+    last_lyrics_id bigint
+);
+WITH words AS (
+    SELECT ARRAY['love','you','night','heart','fire','dream','home','time','baby',
+                 'girl','dance','rain','blue','light','summer','road','gold','wild',
+                 'river','song','moon','star','city','young','dark','free','world',
+                 'sweet','forever','alone','tonight','money','run','lost','angel'] AS w
+)
+INSERT INTO {SCHEMA}.tracks
+SELECT g,
+       t.name, lower(t.name),
+       t.artist, lower(t.artist),
+       t.album, lower(t.album),
+       120 + (g % 240),
+       g
+FROM generate_series(1, $1::int) g, words,
+LATERAL (
+    SELECT initcap(w[1 + (g * 7) % 35] || ' ' || w[1 + (g * 13) % 35]) AS name,
+           'Artist ' || (g % 50000) AS artist,
+           initcap(w[1 + (g * 17) % 35]) || ' ' || (g % 997) AS album
+) t;
+INSERT INTO {SCHEMA}.lyrics (id, plain_lyrics, synced_lyrics)
+SELECT id, repeat('la ', 200), repeat('[00:01.00] la\n', 50) FROM {SCHEMA}.tracks;
+ANALYZE {SCHEMA}.tracks;
+ANALYZE {SCHEMA}.lyrics;
+"""
+
+OLD_QUERY = f"""
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT tracks.id, tracks.name, tracks.artist_name, tracks.album_name, tracks.duration,
+       lyrics.instrumental, lyrics.plain_lyrics, lyrics.synced_lyrics
+FROM {SCHEMA}.tracks
+  LEFT JOIN {SCHEMA}.lyrics ON tracks.last_lyrics_id = lyrics.id
+WHERE to_tsvector('english', coalesce(tracks.name_lower, '') || ' ' || coalesce(tracks.artist_name_lower, '') || ' ' || coalesce(tracks.album_name_lower, '')) @@ to_tsquery($1)
+LIMIT 20
+"""
+
+NEW_QUERY = f"""
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT tracks.id, tracks.name, tracks.artist_name, tracks.album_name, tracks.duration,
+       lyrics.instrumental, lyrics.plain_lyrics, lyrics.synced_lyrics
+FROM {SCHEMA}.tracks
+  CROSS JOIN (
+    SELECT plainto_tsquery('english', $1) && to_tsquery('english', $2) AS query
+  ) search
+  LEFT JOIN {SCHEMA}.lyrics ON tracks.last_lyrics_id = lyrics.id
+WHERE tracks.search_vector @@ search.query
+ORDER BY ts_rank_cd(tracks.search_vector, search.query) DESC, tracks.id
+LIMIT 20
+"""
+
+async def explain(conn, query, *args):
+    rows = await conn.fetch(query, *args)
+    return "\n".join(r[0] for r in rows)
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--q", default="love you")
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    conn = await connect()
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        start = time.perf_counter()
+        await conn.execute(SEED.replace("$1::int", str(int(args.rows))))
+        print(f"seeded {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+        q = prepare_input(args.q)
+        print("\n-- before: to_tsvector per row, unranked --")
+        print(await explain(conn, OLD_QUERY, " & ".join(q.split())))
+
+        start = time.perf_counter()
+        for stmt in migration_statements("migrations/001_tracks_search_vector.sql", SCHEMA):
+            await conn.execute(stmt)
+        print(f"\nmigration applied in {time.perf_counter() - start:.1f}s")
+
+        words, prefix = build_fts_terms(q)
+        print("\n-- after: stored search_vector + GIN, ranked --")
+        print(await explain(conn, NEW_QUERY, words, prefix))
+    finally:
+        if not args.keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
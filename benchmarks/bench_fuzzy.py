@@ -0,0 +1,82 @@
+# Latency of the read_track fuzzy fallback on the tracks table.
+#
+# Samples tracks, mangles their signatures the way clients do (a
+# "feat." suffix, a remaster tag, dropped punctuation, a few seconds
+# off the duration), then times FUZZY_SIGNATURE_QUERY for each one and
+# prints p50/p95/max, the hit rate and one EXPLAIN ANALYZE.
+# Needs migration 002 applied.
+#
+#   python -m benchmarks.bench_fuzzy --n 500
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+import asyncpg
+from dotenv import load_dotenv
+
+from app.api import FUZZY_MAX_DURATION_DIFF, FUZZY_MIN_SCORE, FUZZY_SIGNATURE_QUERY, prepare_fuzzy
+
+load_dotenv("app/.env")
+
+def mangle(row: dict, rng: random.Random) -> tuple:
+    artist = row["artist_name"]
+    track = row["name"]
+    album = row["album_name"]
+    choice = rng.randrange(3)
+    if choice == 0:
+        track += " (feat. Someone Else)"
+    elif choice == 1:
+        track += " - 2011 Remaster"
+    else:
+        track = track.replace("'", "").replace(",", "")
+    duration = row["duration"] + rng.randint(-3, 3)
+    return artist, track, album, duration
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    conn = await asyncpg.connect(os.getenv("DATABASE_URL"))
+    try:
+        total = await conn.fetchval("SELECT reltuples::bigint FROM pg_class WHERE relname = 'tracks'")
+        rows = await conn.fetch(
+            """
+            SELECT id, name, artist_name, album_name, duration
+            FROM tracks TABLESAMPLE SYSTEM (1)
+            WHERE last_lyrics_id IS NOT NULL
+            LIMIT $1
+            """,
+            args.n,
+        )
+
+        latencies, hits = [], 0
+        for row in rows:
+            artist, track, album, duration = mangle(dict(row), rng)
+            params = (prepare_fuzzy(artist), prepare_fuzzy(track), prepare_fuzzy(album),
+                      duration, FUZZY_MAX_DURATION_DIFF, FUZZY_MIN_SCORE)
+            start = time.perf_counter()
+            match = await conn.fetchrow(FUZZY_SIGNATURE_QUERY, *params)
+            latencies.append(time.perf_counter() - start)
+            if match is not None and match["id"] == row["id"]:
+                hits += 1
+
+        latencies.sort()
+        print(f"tracks table: ~{total} rows, {len(rows)} mangled lookups")
+        print(f"p50 {statistics.median(latencies) * 1000:.2f} ms   "
+              f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.2f} ms   "
+              f"max {latencies[-1] * 1000:.2f} ms")
+        print(f"matched the original track: {hits / len(rows):.1%}")
+
+        plan = await conn.fetch("EXPLAIN (ANALYZE, BUFFERS) " + FUZZY_SIGNATURE_QUERY, *params)
+        print("\n" + "\n".join(r[0] for r in plan))
+    finally:
+        await conn.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+# Latency of /tracks/by-lyrics on a seeded lyrics table.
+#
+# Seeds a scratch schema (bench_lyrics) with N synthetic tracks and lyrics
+# from benchmarks.seed, applies migrations 000 and 004, then takes
+# snippets of 2-6 consecutive words from random lyric lines and times:
+#   - a substring scan of plain_lyrics (what a search without the stored
+#     tsvector would do), on a few snippets only since it reads every row
+#   - LYRICS_SEARCH_QUERY and LYRICS_PHRASE_QUERY as the API runs them
+#   - the same search with a snippet for every match instead of only the
+#     returned page
+# and prints p50/p95/max for each plus one EXPLAIN ANALYZE.
+#
+#   python -m benchmarks.bench_lyrics_search --tracks 1000000 --n 200
+#
+# The scratch schema is dropped at the end unless --keep is passed.
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from app.api import LYRICS_HEADLINE_OPTIONS, LYRICS_PHRASE_QUERY, LYRICS_SEARCH_QUERY, prepare_input
+from benchmarks.common import connect, migration_files, migration_statements
+from benchmarks.seed import generate
+
+SCHEMA = "bench_lyrics"
+
+SCAN_QUERY = """
+SELECT tracks.id
+FROM lyrics JOIN tracks ON tracks.last_lyrics_id = lyrics.id
+WHERE lyrics.plain_lyrics ILIKE '%' || $1 || '%'
+LIMIT $2
+"""
+
+# ts_headline over every match, what the page query avoids
+EVERY_SNIPPET_QUERY = """
+SELECT tracks.id, ts_headline('english', lyrics.plain_lyrics, search.query, $3) AS snippet
+FROM lyrics
+  CROSS JOIN (SELECT plainto_tsquery('english', $1) AS query) search
+  JOIN tracks ON tracks.last_lyrics_id = lyrics.id
+WHERE lyrics.search_vector @@ search.query
+ORDER BY ts_rank_cd(lyrics.search_vector, search.query, 1) DESC, tracks.id
+LIMIT $2
+"""
+
+def summary(label: str, latencies: list) -> str:
+    latencies = sorted(latencies)
+    return (f"{label:<28} p50 {statistics.median(latencies) * 1000:8.2f} ms   "
+            f"p95 {latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000:8.2f} ms   "
+            f"max {latencies[-1] * 1000:8.2f} ms")
+
+# latencies and average hits per snippet, at most limit of them
+async def timed(conn, query, snippets, args: tuple, limit: int) -> tuple:
+    latencies, hits = [], 0
+    for snippet in snippets:
+        start = time.perf_counter()
+        rows = await conn.fetch(query, snippet, *args)
+        latencies.append(time.perf_counter() - start)
+        hits += min(len(rows), limit)
+    return latencies, hits / len(snippets)
+
+async def seed(conn, tracks: int, rng: random.Random):
+    await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await conn.execute(f"CREATE SCHEMA {SCHEMA}")
+    files = migration_files()
+    for stmt in migration_statements(files[0], SCHEMA):
+        await conn.execute(stmt)
+
+    start = time.perf_counter()
+    for track_rows, lyric_rows in generate(tracks, 1, 10_000, rng):
+        await conn.copy_records_to_table(
+            "lyrics", schema_name=SCHEMA, records=lyric_rows,
+            columns=["id", "plain_lyrics", "synced_lyrics", "track_id", "instrumental"])
+        await conn.copy_records_to_table(
+            "tracks", schema_name=SCHEMA, records=track_rows,
+            columns=["id", "name", "name_lower", "artist_name", "artist_name_lower",
+                     "album_name", "album_name_lower", "duration", "last_lyrics_id"])
+    print(f"seeded {tracks} tracks in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    for stmt in migration_statements("migrations/004_lyrics_search_vector.sql", SCHEMA):
+        await conn.execute(stmt)
+    print(f"migration 004 applied in {time.perf_counter() - start:.1f}s")
+
+    size = await conn.fetchval(
+        f"SELECT pg_size_pretty(pg_relation_size('{SCHEMA}.idx_lyrics_search_vector'))")
+    print(f"GIN index size: {size}")
+
+# 2-6 consecutive words from a random line of sampled lyrics
+async def sample_snippets(conn, n: int, rng: random.Random) -> list:
+    rows = await conn.fetch(
+        "SELECT plain_lyrics FROM lyrics WHERE plain_lyrics IS NOT NULL ORDER BY random() LIMIT $1", n)
+    snippets = []
+    for row in rows:
+        words = rng.choice(row["plain_lyrics"].splitlines()).split()
+        length = min(len(words), rng.randint(2, 6))
+        start = rng.randrange(len(words) - length + 1)
+        snippets.append(prepare_input(" ".join(words[start:start + length])))
+    return [s for s in snippets if s]
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=1_000_000)
+    parser.add_argument("--n", type=int, default=200, help="snippets to search for")
+    parser.add_argument("--scan-n", type=int, default=10, help="snippets for the substring scan")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    conn = await connect()
+    try:
+        await seed(conn, args.tracks, rng)
+        # the API's queries use unqualified table names
+        await conn.execute(f"SET search_path TO {SCHEMA}, public")
+        snippets = await sample_snippets(conn, args.n, rng)
+        page = (None, None, args.limit, LYRICS_HEADLINE_OPTIONS)
+
+        latencies, hits = await timed(conn, SCAN_QUERY, snippets[:args.scan_n], (args.limit,), args.limit)
+        print("\n" + summary("substring scan", latencies) + f"   {hits:.1f} hits")
+        for label, query in (("words (plainto_tsquery)", LYRICS_SEARCH_QUERY),
+                             ("phrase (phraseto_tsquery)", LYRICS_PHRASE_QUERY)):
+            # the query returns one row past the page
+            latencies, hits = await timed(conn, query, snippets, page, args.limit)
+            print(summary(label, latencies) + f"   {hits:.1f} hits")
+        latencies, hits = await timed(conn, EVERY_SNIPPET_QUERY, snippets,
+                                      (1_000_000, LYRICS_HEADLINE_OPTIONS), 1_000_000)
+        print(summary("snippet for every match", latencies) + f"   {hits:.1f} matches")
+
+        plan = await conn.fetch("EXPLAIN (ANALYZE, BUFFERS) " + LYRICS_PHRASE_QUERY, snippets[0], *page)
+        print(f"\n-- phrase query for {snippets[0]!r} --")
+        print("\n".join(r[0] for r in plan))
+    finally:
+        if not args.keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,51 @@
+# Payload size and latency of /tracks with and without lyric text.
+#
+# Runs each query a few times in both modes against a live server and
+# prints the average response size and latency per mode.
+#
+# Start the API first (python main.py), then:
+#   python -m benchmarks.bench_search_payload --url http://127.0.0.1:8000
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+QUERIES = ["love", "taylor swift", "night", "dream on", "fire", "blue", "queen", "summer"]
+
+MODES = {
+    "full": {},
+    "include_lyrics=false": {"include_lyrics": "false"},
+    "fields=id,name,artist_name": {"fields": "id,name,artist_name"},
+}
+
+async def measure(client: httpx.AsyncClient, params: dict, repeat: int):
+    sizes, latencies = [], []
+    for _ in range(repeat):
+        for q in QUERIES:
+            start = time.perf_counter()
+            response = await client.get("/tracks", params={"q": q, **params})
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+            sizes.append(len(response.content))
+    return statistics.mean(sizes), statistics.median(latencies)
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        # one pass first so every mode runs against a warm database
+        await measure(client, {}, 1)
+        results = {mode: await measure(client, params, args.repeat) for mode, params in MODES.items()}
+
+    full_size, full_latency = results["full"]
+    for mode, (size, latency) in results.items():
+        print(f"{mode:28} {size / 1024:8.1f} KiB ({size / full_size:6.1%})   "
+              f"p50 {latency * 1000:6.1f} ms ({latency - full_latency:+.4f} s)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
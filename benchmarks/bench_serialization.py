@@ -0,0 +1,99 @@
+# Serialization cost of a /tracks page and a single /get lookup, per path.
+#
+# Rows are synthetic (lyrics from benchmarks.seed, so multi-kilobyte
+# text) and no database is needed. The "models" path is what the API did
+# before: a SimpleLyrics and a SimpleTrack per row, then FastAPI's
+# response_model validation and the stdlib JSON encoder. The "orjson"
+# path builds plain dicts and encodes them with orjson.
+#
+#   python -m benchmarks.bench_serialization --rows 100 --repeat 200
+import argparse
+import json
+import random
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.models import SimpleLyrics, SimpleTrack
+from app.serialization import dumps, search_row_to_track
+from benchmarks.seed import lyric_lines, synced_from, title
+
+def make_rows(n: int, rng: random.Random) -> list:
+    rows = []
+    for id in range(1, n + 1):
+        lines = lyric_lines(rng)
+        duration = rng.randint(120, 300)
+        rows.append({
+            "id": id,
+            "name": title(rng, 1, 6),
+            "artist_name": title(rng, 1, 4),
+            "album_name": title(rng, 1, 5),
+            "duration": duration,
+            "instrumental": False,
+            "plain_lyrics": "\n".join(lines),
+            "synced_lyrics": synced_from(lines, duration, rng),
+            "has_plain": True,
+            "has_synced": True,
+            "rank": rng.random(),
+        })
+    return rows
+
+# the per-row models and response_model pass /tracks used to go through
+page_adapter = TypeAdapter(List[SimpleTrack])
+
+def models_page(rows: list) -> bytes:
+    tracks = []
+    for row in rows:
+        last_lyrics = SimpleLyrics(
+            plain_lyrics=row['plain_lyrics'] or "",
+            synced_lyrics=row['synced_lyrics'] or "",
+            instrumental=row['instrumental'] if row['instrumental'] is not None else False
+        )
+        tracks.append(SimpleTrack(
+            id=row['id'], name=row['name'], artist_name=row['artist_name'],
+            album_name=row['album_name'], duration=row['duration'],
+            has_plain=row['has_plain'], has_synced=row['has_synced'], last_lyrics=last_lyrics
+        ))
+    content = page_adapter.dump_python(page_adapter.validate_python(tracks), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def orjson_page(rows: list) -> bytes:
+    return dumps([search_row_to_track(row) for row in rows])
+
+# /get/{id} used to return dict(row) through response_model=dict
+def models_single(row: dict) -> bytes:
+    content = jsonable_encoder(row)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def orjson_single(row: dict) -> bytes:
+    return dumps(row)
+
+def timeit(fn, arg, repeat: int) -> float:
+    fn(arg)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.perf_counter() - start) / repeat
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows, random.Random(args.seed))
+    single = {k: v for k, v in rows[0].items() if k not in ("rank", "has_plain", "has_synced")}
+    payload = len(orjson_page(rows))
+    print(f"{args.rows} rows, {payload / 1024:.0f} KiB page, {len(orjson_single(single))} B single track")
+
+    for label, fns, arg in (("page", (models_page, orjson_page), rows),
+                            ("single", (models_single, orjson_single), single)):
+        times = [timeit(fn, arg, args.repeat) for fn in fns]
+        print(f"{label:<7} models {times[0] * 1e6:9.1f} us   orjson {times[1] * 1e6:9.1f} us   "
+              f"{times[0] / times[1]:.1f}x")
+
+if __name__ == "__main__":
+    main()
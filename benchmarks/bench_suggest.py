@@ -0,0 +1,89 @@
+# Build time, resident size and lookup latency of the /suggest prefix index.
+#
+# By default the rows come from the synthetic generator in
+# benchmarks.seed, grouped the way SNAPSHOT_QUERY groups them, so no
+# database is needed. --from-db reads SNAPSHOT_QUERY from the database in
+# the env instead. Lookups use prefixes of 1 to 8 characters cut from
+# random artist and track names.
+#
+#   python -m benchmarks.bench_suggest --tracks 1000000
+#   python -m benchmarks.bench_suggest --from-db
+import argparse
+import asyncio
+import gc
+import random
+import statistics
+import time
+
+from app.normalize import prepare_input
+from app.suggest import SNAPSHOT_QUERY, SUGGEST_MAX_ENTRIES, build_index
+from benchmarks.common import connect
+from benchmarks.seed import generate
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * 4096
+
+def synthetic_rows(count: int, seed: int) -> list:
+    groups = {}
+    for tracks, _ in generate(count, 1, 10_000, random.Random(seed), with_lyrics=False):
+        for id, name, name_lower, artist, artist_lower, *_ in tracks:
+            group = groups.get((name_lower, artist_lower))
+            if group is None:
+                groups[(name_lower, artist_lower)] = [id, name, artist, 1]
+            else:
+                group[3] += 1
+    return [tuple(group) for group in groups.values()]
+
+async def db_rows() -> list:
+    conn = await connect()
+    try:
+        async with conn.transaction(readonly=True):
+            return [tuple(row) async for row in conn.cursor(SNAPSHOT_QUERY, SUGGEST_MAX_ENTRIES, prefetch=10000)]
+    finally:
+        await conn.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=1_000_000)
+    parser.add_argument("--from-db", action="store_true")
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    rows = asyncio.run(db_rows()) if args.from_db else synthetic_rows(args.tracks, args.seed)
+    prefixes = []
+    for _, name, artist, _ in rng.sample(rows, min(len(rows), args.lookups)):
+        key = prepare_input(rng.choice((name, artist)))
+        prefixes.append(key[:rng.randint(1, 8)])
+
+    start = time.perf_counter()
+    index = build_index(rows, prepare_input)
+    build_seconds = time.perf_counter() - start
+    del rows
+    gc.collect()
+
+    latencies = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.top(prefix, args.limit)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    # what the index holds, measured by freeing it
+    entries, nbytes = len(index), index.nbytes()
+    with_index = rss_bytes()
+    del index
+    gc.collect()
+    resident = with_index - rss_bytes()
+
+    print(f"{entries:,} entries, built in {build_seconds:.1f}s")
+    print(f"index size {nbytes / 2**20:.1f} MiB, resident {resident / 2**20:.1f} MiB")
+    print(f"lookup top {args.limit}: p50 {statistics.median(latencies) * 1e6:.0f} us   "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1e6:.0f} us   "
+          f"max {latencies[-1] * 1e6:.0f} us")
+
+if __name__ == "__main__":
+    main()
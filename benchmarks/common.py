@@ -0,0 +1,31 @@
+# helpers shared by the benchmark and seeding scripts
+import glob
+import os
+
+import asyncpg
+from dotenv import load_dotenv
+
+load_dotenv("app/.env")
+
+async def connect() -> asyncpg.Connection:
+    return await asyncpg.connect(os.getenv("DATABASE_URL"))
+
+# statements of a migration file, one at a time (CREATE INDEX
+# CONCURRENTLY can't share a multi-statement query). with schema set,
+# the tracks/lyrics tables are qualified with it
+def migration_statements(path: str, schema: str = None) -> list:
+    with open(path) as f:
+        sql = "\n".join(l for l in f.read().splitlines() if not l.lstrip().startswith("--"))
+    if schema:
+        for table in ("tracks", "lyrics"):
+            for keyword in ("TABLE IF NOT EXISTS", "ALTER TABLE", "ON", "ANALYZE", "REFERENCES"):
+                sql = sql.replace(f"{keyword} {table}", f"{keyword} {schema}.{table}")
+    return [stmt.strip() for stmt in sql.split(";") if stmt.strip()]
+
+def migration_files() -> list:
+    return sorted(glob.glob("migrations/*.sql"))
+
+async def run_migrations(conn: asyncpg.Connection, schema: str = None):
+    for path in migration_files():
+        for stmt in migration_statements(path, schema):
+            await conn.execute(stmt)
@@ -0,0 +1,183 @@
+# Replays a request mix against a running API and reports latency
+# percentiles and throughput, written as JSON so runs can be compared.
+#
+# The mix is read from a JSONL file when --requests is given, one request
+# per line: {"method": "GET", "path": "/get/2"} (or "POST" with "json").
+# Otherwise it is generated from a sample of the tracks table, with a
+# Zipfian popularity over tracks and a configurable share of
+# /get/{id}, the signature route and /tracks.
+#
+# Start the API first (python main.py), then:
+#   python -m benchmarks.loadtest --concurrency 32 --requests-total 20000 --out results/base.json
+#   python -m benchmarks.loadtest --requests my_mix.jsonl --concurrency 64
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+import httpx
+
+from benchmarks.common import connect
+
+# share of each kind of request in a generated mix
+DEFAULT_MIX = "get_id=0.5,signature=0.35,search=0.15"
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        kind, _, weight = part.partition("=")
+        weights[kind.strip()] = float(weight)
+    return weights
+
+def load_requests(path: str) -> list:
+    requests = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            entry.setdefault("method", "GET")
+            entry.setdefault("kind", entry["path"].split("?")[0].split("/")[1] or "root")
+            requests.append(entry)
+    return requests
+
+async def sample_tracks(n: int) -> list:
+    conn = await connect()
+    try:
+        rows = await conn.fetch(
+            """
+            SELECT id, name, artist_name, album_name, duration
+            FROM tracks TABLESAMPLE SYSTEM (5)
+            WHERE last_lyrics_id IS NOT NULL
+            LIMIT $1
+            """,
+            n,
+        )
+    finally:
+        await conn.close()
+    return [dict(r) for r in rows]
+
+# n requests drawn from the mix, tracks picked with Zipf(s) popularity
+def generate_requests(tracks: list, n: int, mix: dict, s: float, rng: random.Random) -> list:
+    weights = [1 / (rank ** s) for rank in range(1, len(tracks) + 1)]
+    kinds = list(mix)
+    picks = rng.choices(tracks, weights, k=n)
+    requests = []
+    for track, kind in zip(picks, rng.choices(kinds, [mix[k] for k in kinds], k=n)):
+        if kind == "get_id":
+            path = f"/get/{track['id']}"
+        elif kind == "signature":
+            parts = [track["artist_name"], track["name"], track["album_name"], str(track["duration"])]
+            path = "/get/" + "/".join(quote(p, safe="") for p in parts)
+        else:
+            words = track["name"].split()
+            q = " ".join(words[:rng.randint(1, min(2, len(words)))])
+            path = f"/tracks?q={quote(q)}&include_lyrics=false"
+        requests.append({"method": "GET", "path": path, "kind": kind})
+    return requests
+
+def percentile(sorted_values: list, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+async def run(url: str, requests: list, concurrency: int) -> dict:
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    queue = iter(requests)
+
+    async def worker(client: httpx.AsyncClient):
+        for request in queue:
+            start = time.perf_counter()
+            try:
+                response = await client.request(request["method"], request["path"], json=request.get("json"))
+                # 404s are a normal answer for lookups, only 5xx count as errors
+                if response.status_code >= 500:
+                    errors[request["kind"]] += 1
+            except httpx.HTTPError:
+                errors[request["kind"]] += 1
+            latencies[request["kind"]].append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=30, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    all_latencies = [l for values in latencies.values() for l in values]
+    return {
+        "total": summarize(all_latencies, sum(errors.values()), elapsed),
+        "by_kind": {kind: summarize(values, errors[kind], elapsed) for kind, values in sorted(latencies.items())},
+        "elapsed_s": round(elapsed, 2),
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--requests", help="JSONL request mix to replay")
+    parser.add_argument("--requests-total", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--sample", type=int, default=20_000, help="tracks to draw the generated mix from")
+    parser.add_argument("--warmup", type=int, default=500, help="requests sent before measuring")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the results JSON here")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    if args.requests:
+        requests = load_requests(args.requests)
+    else:
+        tracks = await sample_tracks(args.sample)
+        rng.shuffle(tracks)
+        requests = generate_requests(tracks, args.requests_total + args.warmup, parse_mix(args.mix), args.zipf, rng)
+
+    if args.warmup:
+        await run(args.url, requests[:args.warmup], args.concurrency)
+        requests = requests[args.warmup:]
+
+    results = await run(args.url, requests, args.concurrency)
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "url": args.url,
+        "concurrency": args.concurrency,
+        "source": args.requests or f"generated mix {args.mix}, zipf s={args.zipf}, seed {args.seed}",
+        **results,
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,156 @@
+# Seeds a local Postgres with a synthetic, LRCLIB-shaped dataset.
+#
+# Artists follow a Zipf popularity curve (a few have hundreds of tracks,
+# most have one or two), names are 1-6 words, durations are centred on
+# 3.5 minutes, and lyric length is log-normal with about 8% instrumental
+# tracks. Rows are streamed in batches with binary COPY, then the
+# migrations are applied so the search indexes are built once, at the end.
+#
+#   python -m benchmarks.seed --tracks 1000000
+#   python -m benchmarks.seed --tracks 100000 --schema bench --seed 7
+import argparse
+import asyncio
+import math
+from itertools import accumulate
+import random
+import time
+
+from app.normalize import prepare_input
+from benchmarks.common import connect, migration_files, migration_statements
+
+WORDS = (
+    "love night heart fire dream home time baby girl boy dance rain blue light summer road "
+    "gold wild river song moon star city young dark free world sweet forever alone tonight "
+    "money run lost angel devil heaven hell queen king sky ocean sea storm thunder shadow "
+    "ghost paradise diamond silver broken golden crazy lonely happy sad slow fast high low "
+    "electric midnight morning sunday monday highway train fly fall rise burn cold warm hot "
+    "kiss touch hold tears smile eyes hands soul body mind memory story letter radio "
+    "california london paris tokyo texas brooklyn jungle desert mountain valley garden "
+    "rose flower winter autumn spring echo neon velvet glass stone iron steel paper "
+    "wolves lions tigers birds horses dogs sinners saints strangers lovers friends "
+    "children soldiers outlaws kings rebels brothers sisters daughters sons"
+).split()
+
+LINE_WORDS = (
+    "i you we they she he it the a and but or so if when where what why how my your our "
+    "never always again tonight baby oh yeah hey la na can't won't don't i'm you're we're "
+    "know feel want need say see go come take give make find keep let hold tell call "
+    "love heart night light fire rain time life way home world eyes mind soul dream"
+).split()
+
+def zipf_weights(n: int, s: float) -> list:
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+def title(rng: random.Random, min_words: int, max_words: int) -> str:
+    count = min(max_words, max(min_words, int(rng.expovariate(0.6)) + min_words))
+    return " ".join(rng.choice(WORDS) for _ in range(count)).title()
+
+def lyric_lines(rng: random.Random) -> list:
+    # log-normal line count, median ~40 lines
+    count = max(4, min(250, int(rng.lognormvariate(math.log(40), 0.5))))
+    lines = []
+    for _ in range(count):
+        if lines and rng.random() < 0.25:
+            # choruses repeat
+            lines.append(rng.choice(lines))
+        else:
+            lines.append(" ".join(rng.choice(LINE_WORDS) for _ in range(rng.randint(3, 10))).capitalize())
+    return lines
+
+def synced_from(lines: list, duration: int, rng: random.Random) -> str:
+    step = duration * 1000 / (len(lines) + 2)
+    ms = step * rng.uniform(0.5, 1.5)
+    out = []
+    for line in lines:
+        out.append(f"[{int(ms // 60000):02d}:{ms % 60000 / 1000:05.2f}] {line}")
+        ms += step * rng.uniform(0.7, 1.3)
+    return "\n".join(out)
+
+# yields (tracks, lyrics) batches of records in the table column order.
+# with_lyrics=False leaves the lyric text out, for benchmarks that only
+# need names
+def generate(count: int, start_id: int, batch_size: int, rng: random.Random, with_lyrics: bool = True):
+    artist_count = max(1, count // 20)
+    artists = [title(rng, 1, 4) for _ in range(artist_count)]
+    # cumulative once, choices() would otherwise redo it on every call
+    cum_weights = list(accumulate(zipf_weights(artist_count, 1.1)))
+    albums = {}
+
+    tracks, lyrics = [], []
+    for id in range(start_id, start_id + count):
+        artist = rng.choices(artists, cum_weights=cum_weights, k=1)[0]
+        artist_albums = albums.setdefault(artist, [])
+        if not artist_albums or rng.random() < 0.1:
+            artist_albums.append(title(rng, 1, 5))
+        album = rng.choice(artist_albums)
+        name = title(rng, 1, 6)
+        duration = int(min(900, max(30, rng.gauss(210, 60))))
+
+        instrumental = rng.random() < 0.08
+        if instrumental or not with_lyrics:
+            plain, synced = None, None
+        else:
+            lines = lyric_lines(rng)
+            plain = "\n".join(lines)
+            synced = synced_from(lines, duration, rng) if rng.random() < 0.7 else None
+
+        lyrics.append((id, plain, synced, id, instrumental))
+        tracks.append((
+            id,
+            name, prepare_input(name),
+            artist, prepare_input(artist),
+            album, prepare_input(album),
+            duration, id,
+        ))
+        if len(tracks) >= batch_size:
+            yield tracks, lyrics
+            tracks, lyrics = [], []
+    if tracks:
+        yield tracks, lyrics
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=1_000_000)
+    parser.add_argument("--schema", default="public")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    schema = None if args.schema == "public" else args.schema
+
+    conn = await connect()
+    try:
+        files = migration_files()
+        if schema:
+            await conn.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+        for stmt in migration_statements(files[0], schema):
+            await conn.execute(stmt)
+
+        start_id = await conn.fetchval(f'SELECT coalesce(max(id), 0) + 1 FROM "{args.schema}".tracks')
+        start = time.perf_counter()
+        loaded = 0
+        for tracks, lyrics in generate(args.tracks, start_id, args.batch_size, rng):
+            async with conn.transaction():
+                await conn.copy_records_to_table(
+                    "lyrics", schema_name=args.schema, records=lyrics,
+                    columns=["id", "plain_lyrics", "synced_lyrics", "track_id", "instrumental"])
+                await conn.copy_records_to_table(
+                    "tracks", schema_name=args.schema, records=tracks,
+                    columns=["id", "name", "name_lower", "artist_name", "artist_name_lower",
+                             "album_name", "album_name_lower", "duration", "last_lyrics_id"])
+            loaded += len(tracks)
+            elapsed = time.perf_counter() - start
+            print(f"\r{loaded}/{args.tracks} tracks, {loaded / elapsed:,.0f} rows/s", end="", flush=True)
+        print()
+
+        start = time.perf_counter()
+        for path in files[1:]:
+            for stmt in migration_statements(path, schema):
+                await conn.execute(stmt)
+        await conn.execute(f'ANALYZE "{args.schema}".lyrics')
+        print(f"migrations and indexes: {time.perf_counter() - start:.1f}s")
+    finally:
+        await conn.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,8 @@
+import logging
 import uvicorn
 
+# key=value log lines from the app logger, level set by LOG_LEVEL
+logging.basicConfig(format="ts=%(asctime)s level=%(levelname)s logger=%(name)s %(message)s")
+
 if __name__ == "__main__":
     uvicorn.run("app.api:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,35 @@
+-- Base tables the API reads, for local and benchmark databases.
+-- Production databases loaded from an LRCLIB dump already have them;
+-- every statement is IF NOT EXISTS so this is safe to run there too.
+--   psql "$DATABASE_URL" -f migrations/000_base_schema.sql
+
+CREATE TABLE IF NOT EXISTS lyrics (
+    id bigint PRIMARY KEY,
+    plain_lyrics text,
+    synced_lyrics text,
+    track_id bigint,
+    instrumental boolean NOT NULL DEFAULT false,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS tracks (
+    id bigint PRIMARY KEY,
+    name text,
+    name_lower text,
+    artist_name text,
+    artist_name_lower text,
+    album_name text,
+    album_name_lower text,
+    duration integer,
+    last_lyrics_id bigint REFERENCES lyrics (id),
+    created_at timestamptz NOT NULL DEFAULT now(),
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- exact signature lookups in read_track and /get/batch
+CREATE INDEX IF NOT EXISTS idx_tracks_signature
+    ON tracks (artist_name_lower, name_lower, album_name_lower, duration);
+
+CREATE INDEX IF NOT EXISTS idx_tracks_last_lyrics_id
+    ON tracks (last_lyrics_id);
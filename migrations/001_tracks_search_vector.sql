@@ -0,0 +1,21 @@
+-- Stored, weighted tsvector for /tracks search.
+-- track name is weighted A, artist B and album C so ts_rank_cd
+-- prefers title matches.
+--
+-- Adding a STORED generated column rewrites the table, run this in a
+-- maintenance window on large tables. The index is built CONCURRENTLY so
+-- this file must not be run inside a transaction:
+--   psql "$DATABASE_URL" -f migrations/001_tracks_search_vector.sql
+
+ALTER TABLE tracks
+    ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name_lower, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(artist_name_lower, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(album_name_lower, '')), 'C')
+    ) STORED;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tracks_search_vector
+    ON tracks USING GIN (search_vector);
+
+ANALYZE tracks;
@@ -0,0 +1,15 @@
+-- Trigram indexes for the fuzzy fallback in read_track.
+-- The fallback filters with pg_trgm's % operator on artist and track
+-- name, which these GIN indexes serve. Album only affects the score.
+--
+-- The indexes are built CONCURRENTLY so this file must not be run inside
+-- a transaction:
+--   psql "$DATABASE_URL" -f migrations/002_tracks_trigram_indexes.sql
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tracks_name_lower_trgm
+    ON tracks USING GIN (name_lower gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tracks_artist_name_lower_trgm
+    ON tracks USING GIN (artist_name_lower gin_trgm_ops);
@@ -0,0 +1,9 @@
+-- Index for the incremental refresh of the /suggest prefix index, which
+-- reads the tracks changed since its last snapshot by updated_at.
+--
+-- The index is built CONCURRENTLY so this file must not be run inside
+-- a transaction:
+--   psql "$DATABASE_URL" -f migrations/003_tracks_updated_at_index.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tracks_updated_at
+    ON tracks (updated_at);
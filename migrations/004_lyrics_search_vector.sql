@@ -0,0 +1,20 @@
+-- Stored tsvector over the plain lyrics for /tracks/by-lyrics.
+-- The search matches and ranks on this column only, the lyric text is
+-- read just for the snippets of the rows on the returned page.
+--
+-- Adding a STORED generated column rewrites the lyrics table, which is
+-- by far the largest one. Run this in a maintenance window, or before
+-- the first dump load. The index is built CONCURRENTLY so this file must
+-- not be run inside a transaction:
+--   psql "$DATABASE_URL" -f migrations/004_lyrics_search_vector.sql
+
+ALTER TABLE lyrics
+    ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        to_tsvector('english', coalesce(plain_lyrics, ''))
+    ) STORED;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_lyrics_search_vector
+    ON lyrics USING GIN (search_vector);
+
+ANALYZE lyrics;
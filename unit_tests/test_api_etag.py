@@ -0,0 +1,106 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.api import app, get_db
+from app.cache import track_cache
+from unittest.mock import AsyncMock
+
+# TestClient instance 
+client = TestClient(app)
+
+TRACK = {
+    "id": 2,
+    "name": "Wildest Dreams",
+    "artist_name": "Taylor Swift",
+    "album_name": "1989 (Deluxe)",
+    "duration": 220,
+    "instrumental": False,
+    "plain_lyrics": "Say you'll remember me\n" * 100,
+    "synced_lyrics": "[00:41.25] Say you'll remember me\n" * 100,
+}
+
+# mock connection, track 2 currently points at lyrics 7
+@pytest.fixture
+def mock_db():
+    mock_connection = AsyncMock()
+
+    async def mock_fetchrow(query, *args):
+        if args[0] not in (2, "taylor swift"):
+            return None
+        if "l.plain_lyrics" not in query:
+            return {"id": 2, "last_lyrics_id": 7}
+        return {**TRACK, "last_lyrics_id": 7}
+
+    mock_connection.fetchrow.side_effect = mock_fetchrow
+    return mock_connection
+
+@pytest.fixture(autouse=True)
+def override_get_db(mock_db):
+    track_cache.clear()
+    app.dependency_overrides[get_db] = lambda: mock_db
+    yield
+    app.dependency_overrides.clear()
+    track_cache.clear()
+
+def test_get_id_etag():
+    response = client.get("/get/2", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"2-7"'
+    assert response.json() == TRACK
+
+def test_get_id_not_modified(mock_db):
+    response = client.get("/get/2", headers={"If-None-Match": '"2-7"'})
+    assert response.status_code == 304
+    assert response.content == b""
+    # answered by the id-only query, lyrics were never read
+    assert all("l.plain_lyrics" not in call.args[0] for call in mock_db.fetchrow.call_args_list)
+
+def test_get_id_modified():
+    response = client.get("/get/2", headers={"If-None-Match": '"2-6"'})
+    assert response.status_code == 200
+    assert response.headers["ETag"].startswith('"2-7')
+
+def test_get_signature_not_modified():
+    response = client.get("/get/Taylor Swift/Wildest Dreams/1989 (Deluxe)/220", headers={"If-None-Match": '"2-7-gzip"'})
+    assert response.status_code == 304
+
+def test_get_id_gzip():
+    response = client.get("/get/2", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"] == '"2-7-gzip"'
+    assert response.json() == TRACK
+
+def test_signature_is_normalized_like_the_columns(mock_db):
+    response = client.get("/get/Taylor Swift/Wildest Dreams/1989 (Deluxe)/220", headers={"If-None-Match": '"2-7"'})
+    assert response.status_code == 304
+    # "1989 (Deluxe)" is stored as prepare_input output
+    assert mock_db.fetchrow.call_args.args[1:] == ("taylor swift", "wildest dreams", "1989 deluxe", 220)
+
+def test_not_modified_keeps_the_encoded_etag():
+    response = client.get("/get/2", headers={"Accept-Encoding": "gzip", "If-None-Match": '"1-1", W/"2-7-gzip"'})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"2-7-gzip"'
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+    response = client.get("/get/2", headers={"Accept-Encoding": "identity", "If-None-Match": '"2-7"'})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"2-7"'
+
+def test_vary_is_sent_uncompressed_too():
+    response = client.get("/get/2", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["ETag"] == '"2-7"'
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+def test_unknown_id_with_if_none_match_is_cached(mock_db):
+    for _ in range(3):
+        response = client.get("/get/404", headers={"If-None-Match": '"404-1"'})
+        assert response.status_code == 404
+    # one version lookup and one full lookup, then both misses are cached
+    assert mock_db.fetchrow.await_count == 2
+
+def test_cached_404_skips_the_version_query(mock_db):
+    assert client.get("/get/404").status_code == 404
+    mock_db.fetchrow.reset_mock()
+    response = client.get("/get/404", headers={"If-None-Match": '"404-1"'})
+    assert response.status_code == 404
+    mock_db.fetchrow.assert_not_awaited()
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from starlette.requests import ClientDisconnect
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock
+from app import api, database
+from app.api import app, EXPORT_QUERY, EXPORT_QUERY_NO_LYRICS
+
+# TestClient instance
+client = TestClient(app)
+
+ROWS = [
+    {
+        "id": id,
+        "name": f"Track {id}",
+        "artist_name": "AC/DC",
+        "album_name": "Album",
+        "duration": 200,
+        "instrumental": id == 3,
+        "has_plain": id != 3,
+        "has_synced": False,
+        "plain_lyrics": None if id == 3 else "la la",
+        "synced_lyrics": None,
+        "updated_at": datetime(2024, 1, id, tzinfo=timezone.utc),
+    }
+    for id in range(1, 6)
+]
+
+# async iterable standing in for a server-side cursor
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def __aiter__(self):
+        for row in self.rows:
+            yield row
+
+@asynccontextmanager
+async def fake_transaction(**kwargs):
+    yield
+
+# connection handed out by a patched acquire(), recording its cursor calls
+@pytest.fixture
+def mock_conn(monkeypatch):
+    conn = MagicMock()
+    conn.execute = AsyncMock()
+    conn.transaction = fake_transaction
+    conn.cursor = MagicMock(return_value=FakeCursor(ROWS))
+    conn.released = False
+
+    @asynccontextmanager
+    async def fake_acquire():
+        try:
+            yield conn
+        finally:
+            conn.released = True
+
+    monkeypatch.setattr(database, "acquire", fake_acquire)
+    return conn
+
+def test_export_streams_ndjson(mock_conn):
+    response = client.get("/export/tracks")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["id"] for line in lines] == [1, 2, 3, 4, 5]
+    assert lines[0]["updated_at"] == "2024-01-01T00:00:00+00:00"
+    assert "plain_lyrics" not in lines[0]
+    assert lines[2]["instrumental"] is True
+    assert mock_conn.released
+
+    query, *args = mock_conn.cursor.call_args.args
+    assert query == EXPORT_QUERY_NO_LYRICS
+    assert args == [None, None, None, None, None]
+    assert mock_conn.cursor.call_args.kwargs["prefetch"] == api.EXPORT_PREFETCH
+
+def test_export_filters(mock_conn):
+    response = client.get("/export/tracks", params={
+        "artist_name": "AC/DC", "min_id": 2, "max_id": 4, "instrumental": "false",
+        "updated_since": "2024-01-02T00:00:00", "include_lyrics": "true",
+    })
+    assert response.status_code == 200
+    assert json.loads(response.text.splitlines()[0])["plain_lyrics"] == "la la"
+
+    query, *args = mock_conn.cursor.call_args.args
+    assert query == EXPORT_QUERY
+    assert args == ["ac dc", 2, 4, False, datetime(2024, 1, 2, tzinfo=timezone.utc)]
+
+def test_export_writes_bounded_chunks(mock_conn, monkeypatch):
+    monkeypatch.setattr(api, "EXPORT_CHUNK_BYTES", 1)
+    monkeypatch.setattr(api, "active_exports", 1)
+
+    async def run():
+        db = database.LazyConnection()
+        stream = api.stream_export(db, EXPORT_QUERY_NO_LYRICS, (None,) * 5, False)
+        chunks = [chunk async for chunk in stream]
+        await api.finish_export(stream, db)
+        return chunks
+
+    chunks = asyncio.run(run())
+    assert len(chunks) == len(ROWS)
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+    assert mock_conn.released
+    assert api.active_exports == 0
+
+def test_export_concurrency_limit(mock_conn, monkeypatch):
+    monkeypatch.setattr(api, "active_exports", api.EXPORT_MAX_CONCURRENT)
+    response = client.get("/export/tracks")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "30"
+    mock_conn.cursor.assert_not_called()
+
+def test_export_releases_the_slot(mock_conn):
+    client.get("/export/tracks")
+    assert api.active_exports == 0
+
+def test_export_slot_is_taken_before_the_pool_wait(mock_conn, monkeypatch):
+    monkeypatch.setattr(api, "EXPORT_MAX_CONCURRENT", 1)
+    monkeypatch.setattr(api, "active_exports", 0)
+    started, release = asyncio.Event(), asyncio.Event()
+
+    @asynccontextmanager
+    async def slow_acquire():
+        started.set()
+        await release.wait()
+        yield mock_conn
+
+    monkeypatch.setattr(database, "acquire", slow_acquire)
+    params = dict(artist_name=None, min_id=None, max_id=None, instrumental=None,
+                  updated_since=None, include_lyrics=False)
+
+    async def run():
+        first = asyncio.create_task(api.export_tracks(**params))
+        await started.wait()
+        # the first export is still waiting on the pool
+        with pytest.raises(api.HTTPException) as exc:
+            await api.export_tracks(**params)
+        release.set()
+        await first
+        return exc.value.status_code
+
+    assert asyncio.run(run()) == 429
+
+def test_export_slot_is_returned_when_the_pool_times_out(monkeypatch):
+    @asynccontextmanager
+    async def timed_out_acquire():
+        raise database.PoolTimeout()
+        yield
+
+    monkeypatch.setattr(database, "acquire", timed_out_acquire)
+    response = client.get("/export/tracks")
+    assert response.status_code == 503
+    assert api.active_exports == 0
+
+def test_export_cleans_up_when_the_client_leaves_before_the_stream(mock_conn, monkeypatch):
+    monkeypatch.setattr(api, "active_exports", 0)
+    params = dict(artist_name=None, min_id=None, max_id=None, instrumental=None,
+                  updated_since=None, include_lyrics=False)
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    # the client is gone by the time the headers go out
+    async def send(message):
+        raise OSError("connection reset")
+
+    async def run():
+        response = await api.export_tracks(**params)
+        assert api.active_exports == 1
+        with pytest.raises(ClientDisconnect):
+            await response(scope, receive, send)
+
+    asyncio.run(run())
+    assert mock_conn.released
+    mock_conn.cursor.assert_not_called()
+    assert api.active_exports == 0
@@ -33,28 +33,28 @@ def test_get_all_no_match():
 
 # unit test for album name input field incorrect
 def test_get_all_invalid_album_name(): 
-    response = client.get("/get/The Longest Johns/General Taylor/Between Water and Wind/197")
+    response = client.get("/get/The Longest Johns/General Taylor/Between Water and Wind/197", params={"fuzzy": "false"})
     assert response.status_code == 404
     data = response.json()
     assert data == {"detail": "Track or Artist not found"}
 
 # unit test for artist name input field incorrect
 def test_get_all_invalid_artist_name(): 
-    response = client.get("/get/The Johns Longest/General Taylor/Between Wind and Water/197")
+    response = client.get("/get/The Johns Longest/General Taylor/Between Wind and Water/197", params={"fuzzy": "false"})
     assert response.status_code == 404
     data = response.json()
     assert data == {"detail": "Track or Artist not found"}
 
 # unit test for track name input field incorrect
 def test_get_all_invalid_track_name(): 
-    response = client.get("/get/The Longest Johns/General T/Between Wind and Water/197")
+    response = client.get("/get/The Longest Johns/General T/Between Wind and Water/197", params={"fuzzy": "false"})
     assert response.status_code == 404
     data = response.json()
     assert data == {"detail": "Track or Artist not found"}
 
 # unit test for duration name input field incorrect
 def test_get_all_invalid_duation(): 
-    response = client.get("/get/The Longest Johns/General Taylor/Between Wind and Water/201")
+    response = client.get("/get/The Longest Johns/General Taylor/Between Wind and Water/201", params={"fuzzy": "false"})
     assert response.status_code == 404
     data = response.json()
     assert data == {"detail": "Track or Artist not found"}
@@ -0,0 +1,75 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.api import app, get_db
+from app.cache import track_cache
+from unittest.mock import AsyncMock
+
+# TestClient instance 
+client = TestClient(app)
+
+TRACK = {
+    "id": 2,
+    "name": "Wildest Dreams",
+    "artist_name": "Taylor Swift",
+    "album_name": "1989 (Deluxe)",
+    "duration": 220,
+    "instrumental": False,
+    "plain_lyrics": "Say you'll remember me",
+    "synced_lyrics": "[00:41.25] Say you'll remember me",
+}
+
+# mock connection, id 2 and the Wildest Dreams signature exist
+@pytest.fixture
+def mock_db():
+    mock_connection = AsyncMock()
+
+    async def mock_fetch(query, ids, artists, tracks, albums, durations):
+        rows = []
+        for ord, id in enumerate(ids, 1):
+            if id == 2:
+                rows.append({"kind": "id", "ord": ord, **TRACK})
+        for ord, (artist, track, duration) in enumerate(zip(artists, tracks, durations), 1):
+            if artist == "taylor swift" and track == "wildest dreams" and abs(duration - 220) <= 2:
+                rows.append({"kind": "sig", "ord": ord, **TRACK})
+        return rows
+
+    mock_connection.fetch.side_effect = mock_fetch
+    return mock_connection
+
+@pytest.fixture(autouse=True)
+def override_get_db(mock_db):
+    track_cache.clear()
+    app.dependency_overrides[get_db] = lambda: mock_db
+    yield
+    app.dependency_overrides.clear()
+    track_cache.clear()
+
+def test_get_batch(mock_db):
+    response = client.post("/get/batch", json={
+        "ids": [2, 9],
+        "signatures": [
+            {"artist_name": "Unknown", "track_name": "Nothing", "album_name": "None", "duration": 100},
+            {"artist_name": "Taylor Swift", "track_name": "Wildest Dreams", "album_name": "1989 (Deluxe)", "duration": 221},
+        ],
+    })
+    assert response.status_code == 200
+    assert response.json() == {"ids": [TRACK, None], "signatures": [None, TRACK]}
+    assert mock_db.fetch.await_count == 1
+
+def test_get_batch_uses_cache(mock_db):
+    client.post("/get/batch", json={"ids": [2, 9]})
+    response = client.post("/get/batch", json={"ids": [9, 2]})
+    assert response.json() == {"ids": [None, TRACK], "signatures": []}
+    assert mock_db.fetch.await_count == 1
+
+def test_get_batch_too_large():
+    response = client.post("/get/batch", json={"ids": list(range(501))})
+    assert response.status_code == 422
+
+def test_get_batch_normalizes_signatures(mock_db):
+    response = client.post("/get/batch", json={
+        "signatures": [{"artist_name": "AC/DC", "track_name": "Don't Stop", "album_name": "Greatest (Hits)", "duration": 212}],
+    })
+    assert response.status_code == 200
+    _, _, artists, tracks, albums, _ = mock_db.fetch.call_args.args
+    assert (artists, tracks, albums) == (["ac dc"], ["dont stop"], ["greatest hits"])
@@ -0,0 +1,83 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.api import app, get_db
+from app.cache import track_cache
+from unittest.mock import AsyncMock
+
+# TestClient instance 
+client = TestClient(app)
+
+TRACK = {
+    "id": 99,
+    "name": "General Taylor",
+    "artist_name": "The Longest Johns",
+    "album_name": "Between Wind And Water",
+    "duration": 197,
+    "instrumental": False,
+    "plain_lyrics": "General Taylor gained the day",
+    "synced_lyrics": "[00:01.56] General Taylor gained the day",
+}
+
+# mock connection, exact lookups always miss and the fuzzy query
+# matches anything by The Longest Johns
+@pytest.fixture
+def mock_db():
+    mock_connection = AsyncMock()
+
+    async def mock_fetchrow(query, *args):
+        if "similarity" not in query:
+            return None
+        artist_name, track_name, album_name, duration, max_diff, min_score = args
+        if artist_name == "the longest johns" and min_score <= 0.8:
+            return {**TRACK, "last_lyrics_id": 5, "match_score": 0.8}
+        return None
+
+    mock_connection.fetchrow.side_effect = mock_fetchrow
+    return mock_connection
+
+@pytest.fixture(autouse=True)
+def override_get_db(mock_db):
+    track_cache.clear()
+    app.dependency_overrides[get_db] = lambda: mock_db
+    yield
+    app.dependency_overrides.clear()
+    track_cache.clear()
+
+def test_get_fuzzy_match(mock_db):
+    response = client.get("/get/The Longest Johns (feat. Nobody)/General Taylor - 2020 Remaster/Between Wind/198")
+    assert response.status_code == 200
+    assert response.json() == {**TRACK, "match_score": 0.8}
+    # normalized through prepare_input with the version tags stripped
+    assert mock_db.fetchrow.call_args.args[1:3] == ("the longest johns", "general taylor")
+
+def test_get_fuzzy_opt_out():
+    response = client.get("/get/The Longest Johns/General T/Between Wind/198", params={"fuzzy": "false"})
+    assert response.status_code == 404
+
+def test_get_fuzzy_threshold():
+    response = client.get("/get/The Longest Johns/General T/Between Wind/198", params={"min_score": 0.9})
+    assert response.status_code == 404
+
+def test_get_fuzzy_no_match():
+    response = client.get("/get/Unknown/General Taylor/Between Wind/198")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Track or Artist not found"}
+
+def test_get_fuzzy_not_modified(mock_db):
+    path = "/get/The Longest Johns/General T/Between Wind/198"
+    response = client.get(path)
+    assert response.headers["ETag"] == '"99-5"'
+
+    response = client.get(path, headers={"If-None-Match": '"99-5-gzip"'})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"99-5-gzip"'
+
+@pytest.mark.parametrize("path", [
+    "/get/Ft. X/(feat. Y)/a/100",
+    "/get/!!!/General Taylor/Between Wind/198",
+    "/get/The Longest Johns/Go/Between Wind/198",
+])
+def test_get_fuzzy_skips_names_without_trigrams(mock_db, path):
+    response = client.get(path)
+    assert response.status_code == 404
+    assert not any("similarity" in call.args[0] for call in mock_db.fetchrow.call_args_list)
@@ -0,0 +1,80 @@
+import pytest
+from fastapi.testclient import TestClient
+from app import api
+from app.api import app, get_db
+from app.cache import track_cache, synced_cache
+from unittest.mock import AsyncMock
+
+# TestClient instance 
+client = TestClient(app)
+
+SYNCED = "[00:01.00] one\n[00:02.50] two\n[00:04.00] three"
+
+# mock connection, track 2 points at lyrics 7
+@pytest.fixture
+def mock_db():
+    mock_connection = AsyncMock()
+
+    async def mock_fetchrow(query, id):
+        return {"id": 2, "last_lyrics_id": 7} if id == 2 else None
+
+    async def mock_fetchval(query, lyrics_id):
+        return SYNCED
+
+    mock_connection.fetchrow.side_effect = mock_fetchrow
+    mock_connection.fetchval.side_effect = mock_fetchval
+    return mock_connection
+
+@pytest.fixture(autouse=True)
+def override_get_db(mock_db):
+    track_cache.clear()
+    synced_cache.clear()
+    app.dependency_overrides[get_db] = lambda: mock_db
+    yield
+    app.dependency_overrides.clear()
+
+def test_get_synced(mock_db):
+    response = client.get("/get/2/synced")
+    assert response.status_code == 200
+    assert response.json() == {
+        "id": 2,
+        "lyrics_id": 7,
+        "offsets_ms": [1000, 2500, 4000],
+        "lines": ["one", "two", "three"],
+    }
+    # parsed once, the second call doesn't read the lyrics again
+    client.get("/get/2/synced")
+    assert mock_db.fetchval.await_count == 1
+
+def test_get_synced_at_time():
+    response = client.get("/get/2/synced", params={"t": 3000})
+    assert response.json() == {
+        "id": 2,
+        "lyrics_id": 7,
+        "index": 1,
+        "offset_ms": 2500,
+        "line": "two",
+        "next_offset_ms": 4000,
+    }
+
+def test_get_synced_window():
+    response = client.get("/get/2/synced", params={"from": 3000, "to": 5000})
+    assert response.json()["lines"] == ["two", "three"]
+    assert response.json()["start_index"] == 1
+
+def test_get_synced_not_found():
+    response = client.get("/get/9/synced")
+    assert response.status_code == 404
+
+def test_get_synced_not_found_is_cached(mock_db):
+    assert client.get("/get/9/synced").status_code == 404
+    assert client.get("/get/9/synced", headers={"If-None-Match": '"9-1"'}).status_code == 404
+    assert mock_db.fetchrow.await_count == 1
+
+def test_invalidating_an_id_drops_its_cached_miss(mock_db, monkeypatch):
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    assert client.get("/get/9/synced").status_code == 404
+    response = client.post("/admin/cache/invalidate", json={"ids": [9]}, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert client.get("/get/9/synced").status_code == 404
+    assert mock_db.fetchrow.await_count == 2
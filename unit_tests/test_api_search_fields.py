@@ -0,0 +1,83 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.api import app, build_fts_terms, get_db
+from unittest.mock import AsyncMock
+
+# TestClient instance 
+client = TestClient(app)
+
+ROW = {
+    "id": 2,
+    "name": "Wildest Dreams",
+    "artist_name": "Taylor Swift",
+    "album_name": "1989 (Deluxe)",
+    "duration": 220,
+    "instrumental": False,
+    "plain_lyrics": "Say you'll remember me",
+    "synced_lyrics": "[00:41.25] Say you'll remember me",
+    "has_plain": True,
+    "has_synced": True,
+    "rank": 0.5,
+}
+
+# mock connection returning one search hit, without the lyric
+# columns when the query doesn't select them
+@pytest.fixture
+def mock_db():
+    mock_connection = AsyncMock()
+
+    async def mock_fetch(query, *args):
+        if "lyrics.plain_lyrics," in query:
+            return [ROW]
+        return [{k: v for k, v in ROW.items() if k not in ("plain_lyrics", "synced_lyrics")}]
+
+    mock_connection.fetch.side_effect = mock_fetch
+    return mock_connection
+
+@pytest.fixture(autouse=True)
+def override_get_db(mock_db):
+    app.dependency_overrides[get_db] = lambda: mock_db
+    yield
+    app.dependency_overrides.clear()
+
+def test_search_tracks_without_lyrics(mock_db):
+    response = client.get("/tracks", params={"q": "wildest dreams", "include_lyrics": "false"})
+    assert response.status_code == 200
+    assert response.json() == [{
+        "id": 2,
+        "name": "Wildest Dreams",
+        "artist_name": "Taylor Swift",
+        "album_name": "1989 (Deluxe)",
+        "duration": 220,
+        "has_plain": True,
+        "has_synced": True,
+        "last_lyrics": {"instrumental": False},
+    }]
+    assert "lyrics.plain_lyrics," not in mock_db.fetch.call_args.args[0]
+
+def test_search_tracks_fields():
+    response = client.get("/tracks", params={"q": "wildest dreams", "fields": "id,name,has_synced"})
+    assert response.status_code == 200
+    assert response.json() == [{"id": 2, "name": "Wildest Dreams", "has_synced": True}]
+
+def test_search_tracks_with_lyrics():
+    response = client.get("/tracks", params={"q": "wildest dreams"})
+    assert response.status_code == 200
+    assert response.json()[0]["last_lyrics"]["plain_lyrics"] == "Say you'll remember me"
+
+def test_search_tracks_unknown_field():
+    response = client.get("/tracks", params={"q": "wildest dreams", "fields": "id,lyrics"})
+    assert response.status_code == 422
+
+def test_search_words_are_not_operators(mock_db):
+    response = client.get("/tracks", params={"q": "love or -hate swi"})
+    assert response.status_code == 200
+    query, words, prefix, *_ = mock_db.fetch.call_args.args
+    assert "plainto_tsquery('english', $1)" in query
+    assert "websearch_to_tsquery" not in query
+    assert (words, prefix) == ("love or hate", "'swi':*")
+
+def test_fts_prefix_is_quoted():
+    assert build_fts_terms("rock n' rol\\") == ("rock n'", "'rol\\\\':*")
+    assert build_fts_terms("it's") == ("", "'it''s':*")
+    assert build_fts_terms("") == ("", "")
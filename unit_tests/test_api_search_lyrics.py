@@ -0,0 +1,91 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.api import app, get_db, decode_cursor, LYRICS_PHRASE_QUERY, LYRICS_SEARCH_QUERY
+from unittest.mock import AsyncMock
+
+# TestClient instance
+client = TestClient(app)
+
+# 3 hits, ids 1-3, ranked 0.5, 0.3 and 0.1
+ROWS = [
+    {
+        "id": id,
+        "name": f"Track {id}",
+        "artist_name": "Artist",
+        "album_name": "Album",
+        "duration": 200,
+        "instrumental": False,
+        "has_plain": True,
+        "has_synced": id == 1,
+        "rank": 0.5 - 0.2 * (id - 1),
+    }
+    for id in range(1, 4)
+]
+
+# mock connection applying the keyset predicate and limit like the query,
+# with a snippet only on the rows of the page
+@pytest.fixture
+def mock_db():
+    mock_connection = AsyncMock()
+
+    async def mock_fetch(query, q, after_rank, after_id, limit, options):
+        rows = ROWS
+        if after_rank is not None:
+            rows = [r for r in rows if r["rank"] < after_rank or (r["rank"] == after_rank and r["id"] > after_id)]
+        rows = rows[:limit + 1]
+        return [dict(r, snippet=f"... \x02{q}\x03 ..." if i < limit else None) for i, r in enumerate(rows)]
+
+    mock_connection.fetch.side_effect = mock_fetch
+    return mock_connection
+
+@pytest.fixture(autouse=True)
+def override_get_db(mock_db):
+    app.dependency_overrides[get_db] = lambda: mock_db
+    yield
+    app.dependency_overrides.clear()
+
+def test_search_lyrics_pages(mock_db):
+    response = client.get("/tracks/by-lyrics", params={"q": "Hold On, I'm Still Here", "limit": 2})
+    assert response.status_code == 200
+    hits = response.json()
+    assert [h["id"] for h in hits] == [1, 2]
+    assert hits[0]["snippet"] == "... <b>hold on im still here</b> ..."
+    assert "last_lyrics" not in hits[0]
+    assert decode_cursor(response.headers["X-Next-Cursor"]) == (0.3, 2)
+
+    response = client.get("/tracks/by-lyrics", params={
+        "q": "Hold On, I'm Still Here", "limit": 2, "cursor": response.headers["X-Next-Cursor"],
+    })
+    assert [h["id"] for h in response.json()] == [3]
+    assert "X-Next-Cursor" not in response.headers
+    assert mock_db.fetch.call_args.args[0] == LYRICS_SEARCH_QUERY
+
+def test_search_lyrics_phrase(mock_db):
+    response = client.get("/tracks/by-lyrics", params={"q": "still here", "phrase": "true"})
+    assert response.status_code == 200
+    assert mock_db.fetch.call_args.args[0] == LYRICS_PHRASE_QUERY
+
+def test_search_lyrics_empty_query(mock_db):
+    response = client.get("/tracks/by-lyrics", params={"q": "?!"})
+    assert response.status_code == 200
+    assert response.json() == []
+    mock_db.fetch.assert_not_called()
+
+def test_search_lyrics_requires_q():
+    assert client.get("/tracks/by-lyrics").status_code == 422
+
+def test_search_lyrics_invalid_cursor():
+    response = client.get("/tracks/by-lyrics", params={"q": "still here", "cursor": "not-a-cursor"})
+    assert response.status_code == 422
+
+def test_search_lyrics_snippet_is_escaped(mock_db):
+    async def fetch_markup(query, q, after_rank, after_id, limit, options):
+        assert 'StartSel="\x02"' in options
+        snippet = "<script>alert(1)</script> & \x02still\x03 <b>here</b>\x03"
+        return [dict(ROWS[0], snippet=snippet)]
+
+    mock_db.fetch.side_effect = fetch_markup
+    response = client.get("/tracks/by-lyrics", params={"q": "still"})
+    assert response.json()[0]["snippet"] == (
+        "&lt;script&gt;alert(1)&lt;/script&gt; &amp; <b>still</b> &lt;b&gt;here&lt;/b&gt;"
+    )
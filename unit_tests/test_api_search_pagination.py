@@ -0,0 +1,69 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.api import app, get_db, encode_cursor, decode_cursor
+from unittest.mock import AsyncMock
+
+# TestClient instance 
+client = TestClient(app)
+
+# 5 hits, ids 1-5, ranked 0.5 for the first two and 0.1 for the rest
+ROWS = [
+    {
+        "id": id,
+        "name": f"Track {id}",
+        "artist_name": "Artist",
+        "album_name": "Album",
+        "duration": 200,
+        "instrumental": False,
+        "plain_lyrics": "",
+        "synced_lyrics": "",
+        "has_plain": False,
+        "has_synced": False,
+        "rank": 0.5 if id <= 2 else 0.1,
+    }
+    for id in range(1, 6)
+]
+
+# mock connection applying the keyset predicate and limit like the query
+@pytest.fixture
+def mock_db():
+    mock_connection = AsyncMock()
+
+    async def mock_fetch(query, words, prefix, after_rank, after_id, limit):
+        rows = ROWS
+        if after_rank is not None:
+            rows = [r for r in rows if r["rank"] < after_rank or (r["rank"] == after_rank and r["id"] > after_id)]
+        return rows[:limit]
+
+    mock_connection.fetch.side_effect = mock_fetch
+    return mock_connection
+
+@pytest.fixture(autouse=True)
+def override_get_db(mock_db):
+    app.dependency_overrides[get_db] = lambda: mock_db
+    yield
+    app.dependency_overrides.clear()
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(0.25, 42)) == (0.25, 42)
+
+def test_search_tracks_pages():
+    response = client.get("/tracks", params={"q": "track", "limit": 2})
+    assert [t["id"] for t in response.json()] == [1, 2]
+    cursor = response.headers["X-Next-Cursor"]
+    assert decode_cursor(cursor) == (0.5, 2)
+
+    response = client.get("/tracks", params={"q": "track", "limit": 2, "cursor": cursor})
+    assert [t["id"] for t in response.json()] == [3, 4]
+
+    response = client.get("/tracks", params={"q": "track", "limit": 2, "cursor": response.headers["X-Next-Cursor"]})
+    assert [t["id"] for t in response.json()] == [5]
+    assert "X-Next-Cursor" not in response.headers
+
+def test_search_tracks_invalid_cursor():
+    response = client.get("/tracks", params={"q": "track", "cursor": "not a cursor"})
+    assert response.status_code == 422
+
+def test_search_tracks_limit_too_large():
+    response = client.get("/tracks", params={"q": "track", "limit": 1000})
+    assert response.status_code == 422
@@ -0,0 +1,56 @@
+import pytest
+from app.cache import TTLCache, NOT_FOUND, signature_key
+
+# fake clock so ttls can be tested without sleeping
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_cache_hit_and_miss():
+    cache = TTLCache(max_entries=10)
+    assert cache.get("a") is None
+    cache.set("a", {"id": 1})
+    assert cache.get("a") == {"id": 1}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_cache_ttl_expires():
+    clock = Clock()
+    cache = TTLCache(max_entries=10, ttl=10, negative_ttl=2, clock=clock)
+    cache.set("found", {"id": 1})
+    cache.set("missing", NOT_FOUND)
+    clock.now = 3
+    assert cache.get("missing") is None
+    assert cache.get("found") == {"id": 1}
+    clock.now = 11
+    assert cache.get("found") is None
+    assert len(cache) == 0
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_cache_byte_budget():
+    cache = TTLCache(max_bytes=2000)
+    for i in range(10):
+        cache.set(i, {"plain_lyrics": "x" * 500})
+    assert cache.bytes <= 2000
+    assert 0 < len(cache) < 10
+
+def test_cache_invalidate_where():
+    cache = TTLCache(max_entries=10)
+    cache.set(("id", 1), {"id": 1})
+    cache.set(signature_key("A", "B", "C", 200), {"id": 1})
+    cache.set(("id", 2), {"id": 2})
+    assert cache.invalidate_where(lambda key, value: value["id"] == 1) == 2
+    assert len(cache) == 1
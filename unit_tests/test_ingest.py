@@ -0,0 +1,84 @@
+import gzip
+import json
+import sqlite3
+import subprocess
+import sys
+from app.ingest import UPSERT_TRACKS, read_dump, to_batch, to_records
+
+def make_sqlite(path: str):
+    db = sqlite3.connect(path)
+    db.executescript("""
+        CREATE TABLE lyrics (id INTEGER PRIMARY KEY, plain_lyrics TEXT, synced_lyrics TEXT,
+                             track_id INTEGER, instrumental INTEGER);
+        CREATE TABLE tracks (id INTEGER PRIMARY KEY, name TEXT, artist_name TEXT, album_name TEXT,
+                             duration FLOAT, last_lyrics_id INTEGER, updated_at TEXT);
+        INSERT INTO lyrics VALUES (10, 'la la', '[00:01.00] la la', 1, 0);
+        INSERT INTO lyrics VALUES (30, NULL, NULL, 3, 1);
+        INSERT INTO tracks VALUES (1, 'Don''t Stop', 'AC/DC', 'Greatest (Hits)', 212.6, 10, '2024-01-01');
+        INSERT INTO tracks VALUES (2, 'No Lyrics', 'Artist', 'Album', 100.0, NULL, '2024-02-01');
+        INSERT INTO tracks VALUES (3, 'Instrumental', 'Artist', 'Album', 90.0, 30, '2024-03-01');
+        INSERT INTO tracks VALUES (4, 'Dangling', 'Artist', 'Album', 90.0, 99, '2024-04-01');
+    """)
+    db.commit()
+    db.close()
+
+def test_records_use_prepare_input():
+    track, lyrics = to_records((1, "Don't Stop", "AC/DC", "Greatest (Hits)", 212.6, 10, "la la", None, 0))
+    assert track == (1, "Don't Stop", "dont stop", "AC/DC", "ac dc", "Greatest (Hits)", "greatest hits", 213, 10)
+    assert lyrics == (10, "la la", None, 1, False)
+
+def test_track_without_lyrics():
+    track, lyrics = to_records((2, "No Lyrics", "Artist", "Album", 100, None, None, None, None))
+    assert track[-1] is None
+    assert lyrics is None
+
+def test_batch_dedupes_lyrics():
+    tracks, lyrics = to_batch([
+        (1, "A", "B", "C", 100, 10, "one", None, 0),
+        (2, "A", "B", "D", 100, 10, "one", None, 0),
+    ])
+    assert len(tracks) == 2
+    assert len(lyrics) == 1
+
+def test_read_sqlite(tmp_path):
+    path = str(tmp_path / "dump.sqlite3")
+    make_sqlite(path)
+    batches = list(read_dump(path, 0, None, 2))
+    assert [len(b) for b in batches] == [2, 2]
+    rows = {row[0]: row for batch in batches for row in batch}
+    assert rows[1][5] == 10 and rows[1][6] == "la la"
+    assert rows[3][8] == 1
+    # last_lyrics_id 99 has no lyrics row
+    assert rows[4][5] is None
+
+def test_read_sqlite_delta(tmp_path):
+    path = str(tmp_path / "dump.sqlite3")
+    make_sqlite(path)
+    assert [row[0] for batch in read_dump(path, 2, None, 10) for row in batch] == [3, 4]
+    assert [row[0] for batch in read_dump(path, 0, "2024-02-15", 10) for row in batch] == [3, 4]
+
+def test_read_ndjson_gz(tmp_path):
+    path = str(tmp_path / "tracks.ndjson.gz")
+    lines = [
+        {"id": 1, "name": "A", "artist_name": "B", "album_name": "C", "duration": 100,
+         "instrumental": False, "plain_lyrics": "x", "synced_lyrics": None},
+        {"id": 2, "name": "D", "artist_name": "E", "album_name": "F", "duration": 100,
+         "instrumental": False, "plain_lyrics": None, "synced_lyrics": None},
+        {"id": 3, "name": "G", "artist_name": "H", "album_name": "I", "duration": 100,
+         "instrumental": True, "plain_lyrics": None, "synced_lyrics": None, "last_lyrics_id": 7},
+    ]
+    with gzip.open(path, "wt") as f:
+        f.write("\n".join(json.dumps(line) for line in lines) + "\n")
+
+    rows = [row for batch in read_dump(path, 0, None, 10) for row in batch]
+    assert [row[5] for row in rows] == [1, None, 7]
+    assert [row[0] for batch in read_dump(path, 1, None, 10) for row in batch] == [2, 3]
+
+def test_upsert_rewrites_lower_columns():
+    changed = UPSERT_TRACKS.split("IS DISTINCT FROM")[1]
+    for column in ("name_lower", "artist_name_lower", "album_name_lower"):
+        assert f"EXCLUDED.{column}" in changed
+
+def test_ingest_does_not_load_the_api():
+    code = "import sys, app.ingest; print('app.api' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.strip() == "False"
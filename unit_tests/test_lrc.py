@@ -0,0 +1,34 @@
+import pytest
+from app.lrc import parse_lrc
+
+LRC = """[ar:The Longest Johns]
+[00:01.56] General Taylor gained the day
+[00:03.97] (Walk him along, John, carry him along)
+[00:15.68][00:47.22] To me, way, hey, Stormy
+[00:07.85] Well General Taylor gained the day
+not a timed line
+[01:03.5] We'll load her up with ale and rum
+[03:14.97] """
+
+def test_parse_lrc():
+    synced = parse_lrc(LRC)
+    assert synced.offsets_ms.tolist() == [1560, 3970, 7850, 15680, 47220, 63500, 194970]
+    assert synced.lines[0] == "General Taylor gained the day"
+    assert synced.lines[3] == synced.lines[4] == "To me, way, hey, Stormy"
+    assert synced.lines[-1] == ""
+
+def test_parse_lrc_empty():
+    assert parse_lrc(None).lines == []
+    assert parse_lrc("plain text only").lines == []
+
+def test_index_at():
+    synced = parse_lrc(LRC)
+    assert synced.index_at(0) == -1
+    assert synced.index_at(1560) == 0
+    assert synced.index_at(5000) == 1
+    assert synced.index_at(999999) == 6
+
+def test_window():
+    synced = parse_lrc(LRC)
+    assert synced.window(5000, 16000) == (1, 4)
+    assert synced.window(0, 1000) == (0, 0)
@@ -0,0 +1,41 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.api import app, get_db
+from app.metrics import Histogram, HistogramVec
+from unittest.mock import AsyncMock
+
+# TestClient instance 
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def override_get_db():
+    mock_connection = AsyncMock()
+    mock_connection.fetchrow.return_value = None
+    app.dependency_overrides[get_db] = lambda: mock_connection
+    yield
+    app.dependency_overrides.clear()
+
+def test_histogram_buckets():
+    histogram = Histogram((0.1, 1))
+    for value in (0.05, 0.1, 0.5, 2):
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.count == 4
+
+def test_histogram_render():
+    vec = HistogramVec("test_seconds", "Test.", ("route",), (0.1, 1))
+    vec.observe(("/a",), 0.5)
+    lines = vec.render()
+    assert 'test_seconds_bucket{route="/a",le="0.1"} 0' in lines
+    assert 'test_seconds_bucket{route="/a",le="1"} 1' in lines
+    assert 'test_seconds_bucket{route="/a",le="+Inf"} 1' in lines
+    assert 'test_seconds_count{route="/a"} 1' in lines
+
+def test_metrics_endpoint():
+    client.get("/get/123456")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    # labelled with the route template, not the raw path
+    assert 'lrclib_http_request_duration_seconds_count{method="GET",route="/get/{id}"}' in response.text
+    assert "lrclib_http_requests_in_flight 1" in response.text
@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app import queries
+from app.api import FUZZY_SIGNATURE_QUERY, HEALTH_QUERY, SEARCH_QUERY, TRACK_BY_ID_QUERY, fuzzy_searchable
+from app.database import LazyConnection
+from app.queries import prepare_statements, query_name, server_settings
+
+# connection whose prepare() hands out mock statements
+def make_connection():
+    conn = MagicMock()
+    conn.prepare = AsyncMock(side_effect=lambda sql: MagicMock(fetchrow=AsyncMock(return_value={"id": 1}),
+                                                               fetch=AsyncMock(return_value=[])))
+    conn.fetchrow = AsyncMock(return_value={"id": 2})
+    conn.fetch = AsyncMock(return_value=[])
+    conn.execute = AsyncMock()
+    conn.transaction.return_value.__aenter__ = AsyncMock()
+    conn.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+    return conn
+
+@pytest.fixture(autouse=True)
+def clear_statements():
+    yield
+    queries._statements.clear()
+
+def test_query_names():
+    assert query_name(TRACK_BY_ID_QUERY) == "track_by_id"
+    assert query_name("SELECT 2") == "other"
+
+def test_plan_cache_mode_is_a_connection_setting():
+    assert server_settings(None) == {}
+    assert server_settings("auto") == {}
+    assert server_settings("force_custom_plan") == {"plan_cache_mode": "force_custom_plan"}
+    with pytest.raises(ValueError):
+        server_settings("sometimes")
+
+def test_prepares_every_registered_query():
+    conn = make_connection()
+    asyncio.run(prepare_statements(conn))
+    assert conn.prepare.await_count == len(queries.QUERIES)
+    assert queries.prepared_statement(conn, HEALTH_QUERY) is not None
+
+def test_failed_prepare_runs_unprepared():
+    conn = make_connection()
+    conn.prepare = AsyncMock(side_effect=Exception("relation does not exist"))
+    asyncio.run(prepare_statements(conn))
+    assert queries.prepared_statement(conn, TRACK_BY_ID_QUERY) is None
+
+    db = LazyConnection()
+    db._conn = conn
+    assert asyncio.run(db.fetchrow(TRACK_BY_ID_QUERY, 2)) == {"id": 2}
+    conn.fetchrow.assert_awaited_once_with(TRACK_BY_ID_QUERY, 2)
+
+def test_lookup_uses_prepared_statement():
+    conn = make_connection()
+    asyncio.run(prepare_statements(conn))
+    db = LazyConnection()
+    db._conn = conn
+
+    assert asyncio.run(db.fetchrow(TRACK_BY_ID_QUERY, 1)) == {"id": 1}
+    queries.prepared_statement(conn, TRACK_BY_ID_QUERY).fetchrow.assert_awaited_once_with(1)
+    conn.fetchrow.assert_not_awaited()
+    conn.transaction.assert_not_called()
+
+def test_search_is_one_round_trip():
+    conn = make_connection()
+    asyncio.run(prepare_statements(conn))
+    db = LazyConnection()
+    db._conn = conn
+
+    asyncio.run(db.fetch(SEARCH_QUERY, "love", "'love':*", None, None, 21))
+    queries.prepared_statement(conn, SEARCH_QUERY).fetch.assert_awaited_once()
+    conn.transaction.assert_not_called()
+    conn.execute.assert_not_awaited()
+
+def test_fuzzy_warmup_names_have_trigrams():
+    # "" would make the warmup read every row on every pooled connection
+    warmup_args = queries.QUERIES[FUZZY_SIGNATURE_QUERY].warmup_args
+    assert fuzzy_searchable(warmup_args[:4])
@@ -0,0 +1,81 @@
+import pytest
+from fastapi.testclient import TestClient
+from app import readiness as readiness_module
+from app.api import app
+from app.readiness import readiness
+
+# TestClient instance, without the lifespan so nothing is warmed up
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def reset_readiness(monkeypatch):
+    monkeypatch.setattr(readiness_module, "READY_WAIT_FOR_SUGGEST", False)
+    readiness.warmed, readiness.draining = False, False
+    yield
+    readiness.warmed, readiness.draining = False, False
+
+def test_not_ready_until_warmed():
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "warming"
+
+    readiness.warmed = True
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+def test_not_ready_while_draining():
+    readiness.warmed = True
+    readiness.draining = True
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "draining"
+
+def test_waits_for_suggest_index(monkeypatch):
+    monkeypatch.setattr(readiness_module, "READY_WAIT_FOR_SUGGEST", True)
+    monkeypatch.setattr(readiness_module, "SUGGEST_ENABLED", True)
+    readiness.warmed = True
+    assert client.get("/ready").json()["status"] == "building_suggest_index"
+
+def test_signal_reports_draining_before_exit():
+    server = pytest.importorskip("app.server")
+    import uvicorn
+    draining = server.DrainingServer(uvicorn.Config("app.api:app"), drain_delay=0)
+    draining.handle_exit(15, None)
+    assert readiness.draining
+    assert draining.should_exit
+
+def test_signal_keeps_serving_for_the_drain_delay():
+    server = pytest.importorskip("app.server")
+    import asyncio
+    import uvicorn
+    assert server.DRAIN_DELAY > 0
+    draining = server.DrainingServer(uvicorn.Config("app.api:app"), drain_delay=0.05)
+
+    async def run():
+        draining.handle_exit(15, None)
+        await asyncio.sleep(0)
+        # still accepting while /ready reports draining
+        assert readiness.draining
+        assert client.get("/ready").json()["status"] == "draining"
+        assert not draining.should_exit
+        await asyncio.sleep(0.1)
+        assert draining.should_exit
+
+    asyncio.run(run())
+
+def test_second_signal_cancels_the_drain_and_forces_exit():
+    server = pytest.importorskip("app.server")
+    import asyncio
+    import uvicorn
+    draining = server.DrainingServer(uvicorn.Config("app.api:app"), drain_delay=0.05)
+
+    async def run():
+        draining.handle_exit(2, None)
+        await asyncio.sleep(0)
+        assert draining.drain_timer is not None
+        draining.handle_exit(2, None)
+        assert draining.should_exit and draining.force_exit
+        assert draining.drain_timer.cancelled()
+
+    asyncio.run(run())
@@ -0,0 +1,146 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app import database
+from app.database import Target, acquire, choose_target
+
+# target with a stub pool that hands out one mock connection
+def make_target(name: str, role: str = "replica", healthy: bool = True) -> Target:
+    target = Target(f"postgresql://user:secret@{name}:5432/LRCDB", role)
+    target.pool = MagicMock()
+    target.pool.acquire = AsyncMock(return_value=MagicMock(name=f"{name}-conn"))
+    target.pool.release = AsyncMock()
+    target.pool.fetchval = AsyncMock(return_value=0.0)
+    target.healthy = healthy
+    return target
+
+@pytest.fixture
+def targets(monkeypatch):
+    primary = make_target("primary", "primary")
+    replicas = [make_target("replica1"), make_target("replica2")]
+    monkeypatch.setattr(database, "primary", primary)
+    monkeypatch.setattr(database, "replicas", replicas)
+    monkeypatch.setattr(database, "pool", primary.pool)
+    monkeypatch.setattr(database, "_pool_loop", None)
+    return primary, replicas
+
+def test_least_outstanding(targets):
+    _, (replica1, replica2) = targets
+    replica1.outstanding = 3
+    replica2.outstanding = 1
+    assert choose_target() is replica2
+
+def test_primary_when_no_replica_is_healthy(targets):
+    primary, replicas = targets
+    for replica in replicas:
+        replica.healthy = False
+    assert choose_target() is primary
+
+def test_name_hides_credentials(targets):
+    primary, _ = targets
+    assert primary.name == "primary:5432/LRCDB"
+    assert "secret" not in str(primary.stats())
+
+def test_failed_check_ejects_and_passing_check_readmits(targets):
+    _, (replica1, _) = targets
+    replica1.pool.fetchval = AsyncMock(side_effect=OSError("connection refused"))
+    asyncio.run(replica1.check())
+    assert not replica1.healthy
+    assert replica1.ejections == 1
+    assert replica1.last_error == "connection refused"
+
+    replica1.pool.fetchval = AsyncMock(return_value=0.2)
+    asyncio.run(replica1.check())
+    assert replica1.healthy
+    assert replica1.lag == 0.2
+
+def test_check_gives_up_on_a_saturated_pool(targets, monkeypatch):
+    _, (replica1, _) = targets
+    monkeypatch.setattr(database, "REPLICA_HEALTH_TIMEOUT", 0.01)
+
+    # every connection is taken, so the check never gets one
+    async def never_acquires(*args, **kwargs):
+        await asyncio.Event().wait()
+
+    replica1.pool.fetchval = never_acquires
+    asyncio.run(asyncio.wait_for(replica1.check(), 1))
+    assert not replica1.healthy
+    assert replica1.last_error == "health check timed out after 0.01s"
+
+def test_lagging_replica_is_ejected(targets, monkeypatch):
+    _, (replica1, _) = targets
+    monkeypatch.setattr(database, "REPLICA_MAX_LAG", 10)
+    replica1.pool.fetchval = AsyncMock(return_value=30.0)
+    asyncio.run(replica1.check())
+    assert not replica1.healthy
+    assert choose_target() is not replica1
+
+def test_acquire_counts_outstanding(targets):
+    _, (replica1, replica2) = targets
+    replica2.healthy = False
+
+    async def run():
+        database._pool_loop = asyncio.get_running_loop()
+        async with acquire():
+            assert replica1.outstanding == 1
+        assert replica1.outstanding == 0
+
+    asyncio.run(run())
+    assert replica1.requests == 1
+    replica1.pool.release.assert_awaited_once()
+
+def test_acquire_falls_back_to_primary(targets):
+    primary, (replica1, replica2) = targets
+    replica2.healthy = False
+    replica1.pool.acquire = AsyncMock(side_effect=OSError("connection reset"))
+
+    async def run():
+        database._pool_loop = asyncio.get_running_loop()
+        async with acquire() as conn:
+            return conn
+
+    assert asyncio.run(run()) is primary.pool.acquire.return_value
+    assert not replica1.healthy
+    assert primary.requests == 1
+
+# open_pool for an address that never answers
+async def blackholed_pool(dsn):
+    await asyncio.Event().wait()
+
+def test_check_gives_up_on_an_unreachable_replica(targets, monkeypatch):
+    _, (replica1, _) = targets
+    replica1.pool = None
+    monkeypatch.setattr(database, "REPLICA_HEALTH_TIMEOUT", 0.01)
+    monkeypatch.setattr(database, "open_pool", blackholed_pool)
+    asyncio.run(asyncio.wait_for(replica1.check(), 1))
+    assert not replica1.healthy
+    assert replica1.pool is None
+    assert replica1.last_error == "health check timed out after 0.01s"
+
+def test_startup_opens_replicas_together(targets, monkeypatch):
+    primary, replicas = targets
+    for replica in replicas:
+        replica.pool = None
+    monkeypatch.setattr(database, "pool", None)
+    monkeypatch.setattr(database, "_health_task", None)
+    monkeypatch.setattr(database, "REPLICA_HEALTH_TIMEOUT", 0.1)
+    monkeypatch.setattr(database, "REPLICA_HEALTH_INTERVAL", 60)
+
+    async def open_pool(dsn):
+        if dsn == database.DATABASE_URL:
+            return primary.pool
+        await blackholed_pool(dsn)
+
+    monkeypatch.setattr(database, "open_pool", open_pool)
+
+    async def run():
+        start = asyncio.get_running_loop().time()
+        await database.create_pool()
+        elapsed = asyncio.get_running_loop().time() - start
+        database._health_task.cancel()
+        return elapsed
+
+    # both replicas time out, in about one timeout rather than two
+    assert asyncio.run(asyncio.wait_for(run(), 1)) < 0.18
+    assert all(not replica.healthy for replica in replicas)
+    assert all(replica.last_error == "connect timed out after 0.1s" for replica in replicas)
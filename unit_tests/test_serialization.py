@@ -0,0 +1,52 @@
+import json
+from app import serialization
+from app.models import SimpleLyrics, SimpleTrack
+from app.serialization import dumps, lean_track, search_row_to_track
+
+ROW = {
+    "id": 1,
+    "name": "Track One",
+    "artist_name": "Artist Ü",
+    "album_name": "Album",
+    "duration": 200,
+    "instrumental": None,
+    "plain_lyrics": "line one\nline \"two\"",
+    "synced_lyrics": None,
+    "has_plain": True,
+    "has_synced": False,
+    "rank": 0.5,
+}
+
+# the models get_tracks_by_keyword used to build for a row
+def model_for(row: dict, include_lyrics: bool) -> SimpleTrack:
+    return SimpleTrack(
+        id=row['id'],
+        name=row['name'],
+        artist_name=row['artist_name'],
+        album_name=row['album_name'],
+        duration=row['duration'],
+        has_plain=row['has_plain'],
+        has_synced=row['has_synced'],
+        last_lyrics=SimpleLyrics(
+            plain_lyrics=(row['plain_lyrics'] or "") if include_lyrics else None,
+            synced_lyrics=(row['synced_lyrics'] or "") if include_lyrics else None,
+            instrumental=row['instrumental'] if row['instrumental'] is not None else False
+        )
+    )
+
+def test_row_matches_model_dump():
+    for include_lyrics in (True, False):
+        assert search_row_to_track(ROW, include_lyrics) == model_for(ROW, include_lyrics).model_dump()
+
+def test_lean_track_matches_model_dump():
+    track = search_row_to_track(ROW, include_lyrics=False)
+    model = model_for(ROW, include_lyrics=False)
+    for include in (None, {"id", "name"}, {"id", "last_lyrics"}):
+        assert lean_track(track, include) == model.model_dump(include=include, exclude_none=True)
+
+def test_dumps_with_and_without_orjson(monkeypatch):
+    track = search_row_to_track(ROW)
+    encoded = dumps(track)
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert dumps(track) == encoded
+    assert json.loads(encoded) == track
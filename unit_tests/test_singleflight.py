@@ -0,0 +1,158 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock
+from app.api import app, get_db
+from app.cache import track_cache
+from app.metrics import singleflight_calls, singleflight_coalesced
+from app.singleflight import SingleFlight
+
+# TestClient instance
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    track_cache.clear()
+    yield
+    track_cache.clear()
+    app.dependency_overrides.clear()
+
+# a call that counts its runs and finishes when released
+def gated_call(release: asyncio.Event, runs: list, result="row"):
+    async def call():
+        runs.append(1)
+        await release.wait()
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return call
+
+def test_concurrent_calls_share_one_run():
+    async def run():
+        flight = SingleFlight("test_share")
+        release, runs = asyncio.Event(), []
+        waiters = [asyncio.create_task(flight.do("k", gated_call(release, runs))) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters)
+        return results, runs, len(flight)
+
+    results, runs, pending = asyncio.run(run())
+    assert results == ["row"] * 5
+    assert len(runs) == 1
+    assert pending == 0
+    assert singleflight_calls.values[("test_share",)] == 1
+    assert singleflight_coalesced.values[("test_share",)] == 4
+
+def test_errors_reach_every_waiter():
+    async def run():
+        flight = SingleFlight("test_error")
+        release, runs = asyncio.Event(), []
+        call = gated_call(release, runs, ValueError("db down"))
+        waiters = [asyncio.create_task(flight.do("k", call)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+
+def test_cancelled_follower_leaves_the_call_running():
+    async def run():
+        flight = SingleFlight("test_follower")
+        release, runs = asyncio.Event(), []
+        call = gated_call(release, runs)
+        owner = asyncio.create_task(flight.do("k", call))
+        follower = asyncio.create_task(flight.do("k", call))
+        await asyncio.sleep(0)
+        follower.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await owner, follower.cancelled()
+
+    assert asyncio.run(run()) == ("row", True)
+
+def test_cancelled_owner_waits_for_followers():
+    async def run():
+        flight = SingleFlight("test_owner")
+        release, runs = asyncio.Event(), []
+        call = gated_call(release, runs)
+        owner = asyncio.create_task(flight.do("k", call))
+        follower = asyncio.create_task(flight.do("k", call))
+        await asyncio.sleep(0)
+        owner.cancel()
+        await asyncio.sleep(0)
+        # the owner's connection runs the query, it can't leave yet
+        assert not owner.done()
+        release.set()
+        result = await follower
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return result
+
+    assert asyncio.run(run()) == "row"
+
+def test_cancelled_lone_owner_cancels_the_call():
+    async def run():
+        flight = SingleFlight("test_lone")
+        release, runs = asyncio.Event(), []
+        owner = asyncio.create_task(flight.do("k", gated_call(release, runs)))
+        await asyncio.sleep(0)
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        await asyncio.sleep(0)
+        return len(flight)
+
+    assert asyncio.run(run()) == 0
+
+def test_lookup_runs_through_single_flight():
+    mock_connection = AsyncMock()
+    mock_connection.fetchrow.return_value = {
+        "id": 2, "name": "Track", "artist_name": "Artist", "album_name": "Album", "duration": 200,
+        "instrumental": False, "plain_lyrics": "la", "synced_lyrics": None, "last_lyrics_id": 7,
+    }
+    app.dependency_overrides[get_db] = lambda: mock_connection
+    before = singleflight_calls.values.get(("lookup",), 0)
+
+    response = client.get("/get/2")
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"2-7"'
+    assert singleflight_calls.values[("lookup",)] == before + 1
+
+def test_request_joining_a_cancelled_call_gets_its_own():
+    async def run():
+        flight = SingleFlight("test_rejoin")
+        release, runs = asyncio.Event(), []
+        call = gated_call(release, runs)
+        owner = asyncio.create_task(flight.do("k", call))
+        await asyncio.sleep(0)
+        owner.cancel()
+        await asyncio.sleep(0)
+        # the owner has cancelled the call, which hasn't finished yet
+        follower = asyncio.create_task(flight.do("k", call))
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return await follower, len(runs)
+
+    assert asyncio.run(run()) == ("row", 2)
+
+def test_follower_retries_a_call_cancelled_under_it():
+    async def run():
+        flight = SingleFlight("test_retry")
+        release, runs = asyncio.Event(), []
+        call = gated_call(release, runs)
+        owner = asyncio.create_task(flight.do("k", call))
+        follower = asyncio.create_task(flight.do("k", call))
+        while not runs:
+            await asyncio.sleep(0)
+        flight._calls["k"].task.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return await follower, len(runs)
+
+    assert asyncio.run(run()) == ("row", 2)
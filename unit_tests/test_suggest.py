@@ -0,0 +1,126 @@
+import asyncio
+import random
+import threading
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+from fastapi.testclient import TestClient
+from app.api import app, prepare_input
+from app import suggest
+from app.suggest import IndexBuilder, build_index, suggester
+
+# TestClient instance
+client = TestClient(app)
+
+ROWS = [
+    (1, "Love Story", "Taylor Swift", 3),
+    (2, "Shake It Off", "Taylor Swift", 5),
+    (3, "Lover", "Taylor Swift", 1),
+    (4, "Love Me Do", "The Beatles", 2),
+    (5, "Taylor", "Jack Johnson", 1),
+    (6, "Loved", "Someone", 1),
+]
+
+@pytest.fixture(autouse=True)
+def reset_suggester():
+    yield
+    suggester.index = None
+    suggester.delta = None
+
+def test_top_by_weight():
+    index = build_index(ROWS, prepare_input)
+    results = [index.entry(i) for i in index.top("love", 10)]
+    assert [r["name"] for r in results] == ["Love Story", "Love Me Do", "Loved", "Lover"]
+    assert results[0] == {"kind": "track", "id": 1, "name": "Love Story", "artist_name": "Taylor Swift", "weight": 3}
+
+def test_artists_weighted_by_releases():
+    index = build_index(ROWS, prepare_input)
+    results = [index.entry(i) for i in index.top("tay", 10)]
+    assert results[0] == {"kind": "artist", "artist_name": "Taylor Swift", "weight": 9}
+    assert results[1]["name"] == "Taylor"
+
+def test_top_matches_brute_force():
+    rng = random.Random(3)
+    words = ["a", "ab", "abc", "b", "ba", "bab", "c"]
+    rows = [(i, " ".join(rng.choice(words) for _ in range(2)), f"artist {i % 7}", rng.randint(1, 50))
+            for i in range(500)]
+    index = build_index(rows, prepare_input)
+    for prefix in ("a", "ab", "ba", "c a", "zz", "artist 3"):
+        matches = [i for i in range(len(index)) if index.key(i).startswith(prefix)]
+        expected = sorted(matches, key=lambda i: (-index.entry(i)["weight"], i))[:10]
+        assert index.top(prefix, 10) == expected
+
+def test_max_entries_keeps_heaviest():
+    index = build_index(ROWS, prepare_input, max_entries=3)
+    assert len(index) == 3
+    assert {index.entry(i)["weight"] for i in range(3)} == {9, 5, 3}
+
+def test_suggest_endpoint():
+    suggester.index = build_index(ROWS, prepare_input)
+    response = client.get("/suggest", params={"prefix": "Love S", "limit": 5})
+    assert response.status_code == 200
+    assert response.json() == [{"kind": "track", "id": 1, "name": "Love Story", "artist_name": "Taylor Swift"}]
+
+def test_delta_overrides_snapshot():
+    suggester.index = build_index(ROWS, prepare_input)
+    suggester.delta = build_index([(7, "Love Song", "New Artist", 20)], prepare_input)
+    response = client.get("/suggest", params={"prefix": "love", "limit": 2})
+    assert [r["name"] for r in response.json()] == ["Love Song", "Love Story"]
+
+def test_suggest_not_ready():
+    response = client.get("/suggest", params={"prefix": "love"})
+    assert response.status_code == 503
+
+def test_builder_packs_batches_like_build_index():
+    builder = IndexBuilder(prepare_input)
+    for start in range(0, len(ROWS), 4):
+        builder.add(ROWS[start:start + 4])
+    index, expected = builder.build(), build_index(ROWS, prepare_input)
+    assert [index.entry(i) for i in range(len(index))] == [expected.entry(i) for i in range(len(expected))]
+
+# a server-side cursor handing out its rows count at a time
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.batches = []
+
+    async def fetch(self, count):
+        batch, self.rows = self.rows[:count], self.rows[count:]
+        self.batches.append(len(batch))
+        return batch
+
+@asynccontextmanager
+async def fake_transaction(**kwargs):
+    yield
+
+# normalize that records the threads it ran on
+def recording_normalize(threads):
+    def normalize(text):
+        threads.add(threading.get_ident())
+        return prepare_input(text)
+    return normalize
+
+def test_rebuild_packs_the_snapshot_in_batches(monkeypatch):
+    monkeypatch.setattr(suggest, "SUGGEST_SNAPSHOT_BATCH", 4)
+    cursor = FakeCursor(ROWS)
+    conn = MagicMock()
+    conn.transaction = fake_transaction
+    conn.fetchval = AsyncMock(return_value="snapshot")
+    conn.cursor = AsyncMock(return_value=cursor)
+    threads = set()
+
+    asyncio.run(suggester.rebuild(conn, recording_normalize(threads)))
+    assert cursor.batches == [4, 2, 0]
+    assert conn.cursor.call_args.args == (suggest.SNAPSHOT_QUERY, suggest.SUGGEST_MAX_ENTRIES)
+    assert suggester.snapshot_at == "snapshot"
+    assert len(suggester.index) == len(build_index(ROWS, prepare_input))
+    assert threading.get_ident() not in threads
+
+def test_refresh_builds_the_delta_off_the_event_loop():
+    conn = MagicMock()
+    conn.fetch = AsyncMock(return_value=[(7, "Love Song", "New Artist", 20)])
+    threads = set()
+
+    assert asyncio.run(suggester.refresh(conn, recording_normalize(threads)))
+    assert suggester.delta.entry(suggester.delta.top("love", 1)[0])["name"] == "Love Song"
+    assert threads and threading.get_ident() not in threads